@@ -0,0 +1,75 @@
+"""Benchmark reading connections from settings tables.
+
+Reads the connections to the inputs of the tools in the current comp (or the
+selected tools) with `Tool.connections_iter()`, which queries every Input,
+and with `fusionless.settings.get_connections()`, which reads them from a
+single settings table.
+
+Must be run with a comp available, eg. from within Fusion.
+
+Usage:
+    python benchmarks/connections.py [--selected] [REPEATS]
+
+"""
+
+import sys
+import time
+
+import fusionless as fu
+from fusionless.settings import get_connections
+
+
+def key(connection):
+    """Return a comparable key for an (Output, Input) connection"""
+    output, input = connection
+    return output.tool().name(), output.ID, input.tool().name(), input.ID
+
+
+def with_connections_iter(comp, tools):
+    return [connection for tool in tools
+            for connection in tool.connections_iter(outputs=False)]
+
+
+def with_settings(comp, tools):
+    return get_connections(comp, tools)
+
+
+def measure(function, comp, tools, repeats):
+    """Return the best time in seconds and the result of `function`"""
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.time()
+        result = function(comp, tools)
+        duration = time.time() - start
+        if best is None or duration < best:
+            best = duration
+    return best, result
+
+
+def main(selected=False, repeats=3):
+    comp = fu.Comp()
+    tools = comp.get_tool_list(selected=selected)
+    if not tools:
+        print("No tools to benchmark")
+        return
+
+    before, expected = measure(with_connections_iter, comp, tools, repeats)
+    after, result = measure(with_settings, comp, tools, repeats)
+
+    if sorted(map(key, expected)) != sorted(map(key, result)):
+        print("Warning: the connections differ")
+
+    print("Read {0} connections of {1} tools".format(len(result),
+                                                     len(tools)))
+    print("  connections_iter: {0:.3f}s".format(before))
+    print("  settings table: {0:.3f}s".format(after))
+    if after:
+        print("  speedup: {0:.1f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    selected = '--selected' in args
+    args = [arg for arg in args if arg != '--selected']
+    main(selected, *[int(arg) for arg in args[:1]])
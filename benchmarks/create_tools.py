@@ -0,0 +1,74 @@
+"""Benchmark creating a network of tools.
+
+Creates a chain of N Blur tools, each renamed, with an Input value set, a
+position and connected to the previous one. Once with a `Comp.create_tool()`
+loop and once with a single `Comp.create_tools()` call. The tools are
+deleted again afterwards.
+
+Must be run with a comp available, eg. from within Fusion.
+
+Usage:
+    python benchmarks/create_tools.py [N]
+
+"""
+
+import sys
+import time
+
+import fusionless as fu
+from fusionless import context
+
+
+def with_create_tool(comp, count):
+    tools = []
+    for i in range(count):
+        tool = comp.create_tool("Blur", name="LoopBlur{0}".format(i))
+        tool.input("XBlurSize").set_value(float(i % 10))
+        tool.set_pos((i % 50, i // 50))
+        if tools:
+            tools[-1].connect_main(tool)
+        tools.append(tool)
+    return tools
+
+
+def with_create_tools(comp, count):
+    specs = dict()
+    for i in range(count):
+        spec = {"type": "Blur",
+                "name": "PasteBlur{0}".format(i),
+                "inputs": {"XBlurSize": float(i % 10)},
+                "pos": (i % 50, i // 50)}
+        if i:
+            spec["connect"] = {"Input": i - 1}
+        specs[i] = spec
+    return list(comp.create_tools(specs).values())
+
+
+def measure(function, comp, count):
+    """Return the seconds `function` took, deleting the created tools"""
+    start = time.time()
+    with context.lock_and_undo_chunk(comp, "Benchmark"):
+        tools = function(comp, count)
+    duration = time.time() - start
+
+    with context.lock_and_undo_chunk(comp, "Benchmark cleanup"):
+        for tool in tools:
+            tool.delete()
+    return duration
+
+
+def main(count=500):
+    comp = fu.Comp()
+
+    before = measure(with_create_tool, comp, count)
+    after = measure(with_create_tools, comp, count)
+
+    print("Created {0} tools".format(count))
+    print("  create_tool loop: {0:.3f}s".format(before))
+    print("  create_tools: {0:.3f}s".format(after))
+    if after:
+        print("  speedup: {0:.1f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,55 @@
+"""Benchmark moving many tools in the Flow.
+
+Creates N Background tools and moves each of them with `Tool.set_pos()`,
+once directly and once within `Comp.layout()` where the moves are queued
+and applied at once. The tools are deleted again afterwards.
+
+Must be run with a comp available, eg. from within Fusion.
+
+Usage:
+    python benchmarks/layout.py [N]
+
+"""
+
+import sys
+import time
+
+import fusionless as fu
+from fusionless import context
+
+
+def move(tools, offset):
+    for i, tool in enumerate(tools):
+        tool.set_pos((i % 50 + offset, i // 50))
+
+
+def main(count=2000):
+    comp = fu.Comp()
+
+    with context.lock_and_undo_chunk(comp, "Benchmark"):
+        tools = comp.create_tools(dict(
+            (i, {"type": "Background", "pos": (i % 50, i // 50)})
+            for i in range(count))).values()
+
+    start = time.time()
+    move(tools, 1)
+    before = time.time() - start
+
+    start = time.time()
+    with comp.layout():
+        move(tools, 2)
+    after = time.time() - start
+
+    with context.lock_and_undo_chunk(comp, "Benchmark cleanup"):
+        for tool in tools:
+            tool.delete()
+
+    print("Moved {0} tools".format(count))
+    print("  set_pos: {0:.3f}s".format(before))
+    print("  set_pos in layout(): {0:.3f}s".format(after))
+    if after:
+        print("  speedup: {0:.1f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,103 @@
+"""Benchmark the memory used per Input wrapper.
+
+Wraps N Inputs and reports the bytes used per wrapper for the compact
+`__slots__` based wrappers and for wrappers carrying a per-instance
+`__dict__`, like all PyObject classes did before they used `__slots__`.
+
+When a comp is available (eg. when run from within Fusion) the references to
+the Inputs of its tools are wrapped, otherwise placeholder references are
+used. The size of a wrapper doesn't depend on what it references.
+
+Usage:
+    python benchmarks/wrapper_memory.py [N]
+
+"""
+
+import sys
+import gc
+
+import fusionless as fu
+
+
+class DictInput(fu.Input):
+    """Input wrapper with a per-instance __dict__ (the layout before slots)"""
+    # No __slots__ defined so instances get a __dict__ again.
+
+
+def get_references(count):
+    """Return `count` references to wrap, from the current comp if possible"""
+    references = []
+    try:
+        comp = fu.Comp()
+    except (RuntimeError, ValueError):
+        comp = None
+
+    if comp is not None:
+        for tool in comp._reference.GetToolList(False).values():
+            references.extend(tool.GetInputList().values())
+            if len(references) >= count:
+                break
+
+    if not references:
+        references = [object()]
+
+    # Repeat the available references until we have enough
+    return [references[i % len(references)] for i in range(count)]
+
+
+def wrap(cls, references):
+    """Allocate a wrapper of `cls` for each reference.
+
+    This bypasses `PyObject.__new__` so each reference gets its own wrapper,
+    even if it was already wrapped before.
+
+    """
+    wrappers = []
+    for reference in references:
+        wrapper = object.__new__(cls)
+        wrapper._reference = reference
+        wrappers.append(wrapper)
+    return wrappers
+
+
+def measure(cls, references):
+    """Return the bytes allocated per wrapper of `cls`"""
+    try:
+        import tracemalloc
+    except ImportError:
+        tracemalloc = None
+
+    if tracemalloc is None:
+        # Python 2: estimate from a single wrapper
+        wrapper = wrap(cls, references[:1])[0]
+        size = sys.getsizeof(wrapper)
+        if hasattr(wrapper, '__dict__'):
+            size += sys.getsizeof(wrapper.__dict__)
+        return float(size)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    wrappers = wrap(cls, references)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Don't count the list holding the wrappers
+    size = after - before - sys.getsizeof(wrappers)
+    return float(size) / len(wrappers)
+
+
+def main(count=200000):
+    references = get_references(count)
+
+    before = measure(DictInput, references)
+    after = measure(fu.Input, references)
+
+    print("Wrapped {0} inputs".format(count))
+    print("  __dict__ wrappers: {0:.1f} bytes per wrapper".format(before))
+    print("  __slots__ wrappers: {0:.1f} bytes per wrapper".format(after))
+    print("  saved: {0:.1f} MB".format((before - after) * count / 1024 ** 2))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
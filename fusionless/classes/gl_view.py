@@ -16,6 +16,8 @@ class GLView(fusionscript.core.PyObject):
 
     >>> comp.CurrentFrame.LeftView
     """
+    __slots__ = ()
+
     # TODO: Implement `GLView`
     # Reference: http://www.steakunderwater.com/VFXPedia/96.0.243.189/index74ef.html?title=Eyeon:Script/Reference/Applications/Fusion/Classes/GLView
     def current_viewer(self):
@@ -42,7 +44,7 @@ class GLViewer(fusionscript.core.PyObject):
     additional methods to set and show the DoD, RoI or LUT.
 
     """
-    pass
+    __slots__ = ()
     # TODO: Implement `GLViewer`
     # Reference: http://www.steakunderwater.com/VFXPedia/96.0.243.189/indexc3e5.html?title=Eyeon:Script/Reference/Applications/Fusion/Classes/GLViewer
 
@@ -52,6 +54,6 @@ class GLImageViewer(GLViewer):
 
     The GLImageViewer has additional methods for the 2D to set and show the DoD, RoI or LUT.
     """
-    pass
+    __slots__ = ()
     # TODO: Implement `GLImageViewer`
     # Reference: http://www.steakunderwater.com/VFXPedia/96.0.243.189/index1cee.html?title=Eyeon:Script/Reference/Applications/Fusion/Classes/GLImageViewer
\ No newline at end of file
@@ -8,6 +8,698 @@ http://www.steakunderwater.com/VFXPedia/96.0.243.189/index8c76.html?title=Eyeon:
 """
 
 import sys
+import time
+import struct
+import weakref
+import threading
+import contextlib
+from collections import OrderedDict
+
+from . import context
+from .settings import bezier_keyframes, SettingsBuilder, FLOW_GRID
+from .settings import tools_by_name
+from .settings import basestring
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    # Python 3
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+# The time used by Input and Output values when no time is given, per thread.
+# See `Comp.at_time()`
+_evaluation = threading.local()
+
+# The active `WriteBatch` that records writes instead of applying them, per
+# thread. See `Comp.batch()`
+_batching = threading.local()
+
+# The composition and Flow of `Comp.layout()` and the moves recorded within
+# it, per thread
+_layout = threading.local()
+
+
+class TypeCache(object):
+    """Cache of the PyObject class resolved for each remote Fusion object.
+
+    Every time a reference gets wrapped `PyObject.__new__` needs to know what
+    type of Fusion object it is. Fetching the object's attributes with
+    `GetAttrs()` for that is a full round trip over the script connection,
+    so instead the resolved class is stored per remote object. On a miss a
+    cheap probe is done on the type name in the reference's string
+    representation, eg. "Input (0x0000020F8C5A3D10) [App: 'Fusion' on ...]",
+    and only when that type name is unknown the attributes are fetched.
+
+    The cache keeps the remote objects it stores alive, so it only holds the
+    `maxsize` most recently resolved ones. Classes registered as `transient`,
+    eg. the `Image` values of Outputs, are never stored since each frame
+    returns a new one.
+
+    Example
+        >>> tools = Comp().get_tool_list()
+        >>> inputs = [tool.inputs() for tool in tools]
+        >>> print type_cache.stats()
+        >>> # {'hits': 4210, 'misses': 312, 'size': 312}
+
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # Ordered from least to most recently used
+        self._classes = OrderedDict()
+        self._transient = set()
+        self._type_names = dict()
+        self._attr_prefixes = list()
+
+    def register(self, cls, type_name=None, attr_prefix=None,
+                 transient=False):
+        """Register how a PyObject class is recognized.
+
+        Args:
+            cls (type): The PyObject class to resolve to.
+            type_name (str): The type name of the remote object as it shows
+                up in its string representation.
+            attr_prefix (str): The prefix of the attribute keys returned by
+                the remote object's `GetAttrs()`.
+            transient (bool): Don't cache the remote objects of this class,
+                eg. values that are only used once.
+
+        """
+        if type_name is not None:
+            self._type_names[type_name] = cls
+        if attr_prefix is not None:
+            self._attr_prefixes.append((attr_prefix, cls))
+        if transient:
+            self._transient.add(cls)
+
+    def resolve(self, reference):
+        """Return the PyObject class for the remote object `reference`.
+
+        Returns:
+            type or None: The resolved class, None if it couldn't be resolved.
+
+        """
+        try:
+            newcls = self._classes.pop(reference, None)
+        except TypeError:
+            # Unhashable objects can't be cached
+            return self._probe(reference)
+
+        if newcls is not None:
+            self.hits += 1
+            self._classes[reference] = newcls
+            return newcls
+
+        self.misses += 1
+        newcls = self._probe(reference)
+        if newcls is not None and newcls not in self._transient:
+            while len(self._classes) >= self.maxsize > 0:
+                self._classes.popitem(last=False)
+            if self.maxsize > 0:
+                self._classes[reference] = newcls
+        return newcls
+
+    def discard(self, reference):
+        """Forget the resolved class for `reference`, eg. when deleted."""
+        try:
+            self._classes.pop(reference, None)
+        except TypeError:
+            pass
+
+    def clear(self):
+        """Clear all resolved classes and reset the counters."""
+        self._classes.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return the hit and miss counters of this cache.
+
+        Returns:
+            dict: The `hits`, `misses` and current `size` of the cache.
+
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._classes)}
+
+    def _probe(self, reference):
+        """Resolve the class of `reference` without using the cache."""
+
+        # A PyRemoteObject returns a value for any attribute so anything that
+        # doesn't have `GetAttrs` can't be a reference to a Fusion object.
+        if hasattr(reference, 'GetAttrs'):
+            type_name = str(reference).split(' ', 1)[0]
+            newcls = self._type_names.get(type_name)
+            if newcls is not None:
+                return newcls
+
+        # Python crashes whenever you perform `type()` or `dir()` on the
+        # PeyeonScript.scripapp() retrieved applications. As such we try to
+        # get the attributes before that check before type-checking in case
+        # of errors.
+        try:
+            attrs = reference.GetAttrs()
+        except AttributeError:
+            # Check if the reference is a PyRemoteObject.
+            # Since we don't have access to the class type that fusion returns
+            # outside of Fusion we use a hack based on its name
+            if type(reference).__name__ != 'PyRemoteObject':
+                raise TypeError("Reference is not of type PyRemoteObject "
+                                "but {0}".format(type(reference).__name__))
+            return None
+
+        if attrs:
+            # Acquire an attribute to check for type (start prefix)
+            # Comp, Tool, Input, Output, View, etc. all return attributes
+            # that define its type
+            data_type = next(iter(attrs))
+            for prefix, cls in self._attr_prefixes:
+                if data_type.startswith(prefix):
+                    return cls
+
+        return None
+
+
+class IdentityMap(object):
+    """Weak-value map holding the one PyObject wrapper per remote object.
+
+    Fusion returns a new PyRemoteObject each time the same object is
+    retrieved, eg. through `GetToolList()` or `GetInputList()`. Using this
+    map `PyObject.__new__` hands back the wrapper that already exists for that
+    remote object instead of allocating a new one, which also makes `is`
+    comparisons between wrappers meaningful.
+
+    Entries are removed automatically once the wrapper is garbage collected.
+
+    """
+
+    def __init__(self):
+        self._wrappers = weakref.WeakValueDictionary()
+
+    def get(self, reference):
+        """Return the existing wrapper for `reference`, or None."""
+        try:
+            return self._wrappers.get(reference)
+        except TypeError:
+            # Unhashable objects are never stored
+            return None
+
+    def add(self, wrapper):
+        """Register `wrapper` as the wrapper of its reference."""
+        try:
+            self._wrappers[wrapper._reference] = wrapper
+        except TypeError:
+            pass
+
+    def discard(self, reference):
+        """Remove the wrapper registered for `reference`, if any."""
+        try:
+            self._wrappers.pop(reference, None)
+        except TypeError:
+            pass
+
+    def clear(self):
+        """Remove all registered wrappers."""
+        self._wrappers.clear()
+
+    def __len__(self):
+        return len(self._wrappers)
+
+
+class AttrsCache(object):
+    """Opt-in cache for the `GetAttrs()` snapshots of PyObject instances.
+
+    By default every `get_attr()` and `get_attrs()` call fetches the
+    attributes from Fusion. With a `ttl` set the attribute table fetched for
+    an object is reused until it's older than `ttl` seconds, or until it gets
+    invalidated by `PyObject.set_attrs()` (which is also used by
+    `Tool.rename()` and `Tool.clear_name()`).
+
+    Example
+        >>> attrs_cache.ttl = 2.0     # cache attributes for two seconds
+        >>> attrs_cache.ttl = None    # disable the cache (default)
+
+        >>> with attrs_cache.scope():
+        >>>     for tool in Comp().get_tool_list():
+        >>>         print tool.get_attr("TOOLS_RegID")
+
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        # Snapshots taken in another generation are never reused
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @contextlib.contextmanager
+    def scope(self, ttl=None):
+        """Cache attribute snapshots within this context.
+
+        Snapshots taken inside the scope are not reused after it.
+
+        Args:
+            ttl (float or None): Seconds a snapshot stays valid within the
+                scope. When None snapshots stay valid during the whole scope.
+
+        """
+        previous = self.ttl
+        self.ttl = float("inf") if ttl is None else ttl
+        self.invalidate()
+        try:
+            yield
+        finally:
+            self.ttl = previous
+            self.invalidate()
+
+    def invalidate(self):
+        """Invalidate the snapshots of all objects."""
+        self.generation += 1
+
+    def stats(self):
+        """Return the hit and miss counters of this cache.
+
+        Returns:
+            dict: The `hits` and `misses` of the cache.
+
+        """
+        return {'hits': self.hits,
+                'misses': self.misses}
+
+    def get(self, obj):
+        """Return the attributes of PyObject `obj`, cached when enabled."""
+        if self.ttl is None:
+            return obj._reference.GetAttrs()
+
+        now = time.time()
+        snapshot = obj._attrs_snapshot
+        if snapshot is not None:
+            generation, timestamp, attrs = snapshot
+            if generation == self.generation and now - timestamp <= self.ttl:
+                self.hits += 1
+                return attrs
+
+        self.misses += 1
+        attrs = obj._reference.GetAttrs()
+        obj._attrs_snapshot = (self.generation, now, attrs)
+        return attrs
+
+
+class InputSchema(object):
+    """The data type and enum tables of an Input.
+
+    Attributes:
+        data_type (str): The data type of the Input, eg. "Number" or "FuID".
+        ids (dict): Maps the (1-based) float index of each enum option to its
+            ID, as used for "FuID" Inputs.
+        indices (dict): Maps the name or ID of each enum option to its
+            (1-based) float index.
+
+    """
+
+    __slots__ = ('data_type', 'ids', 'indices')
+
+    # The enum tables in the order in which they take precedence
+    ID_KEYS = ("INPIDT_MultiButtonControl_ID",
+               "INPIDT_ComboControl_ID")
+    INDEX_KEYS = ("INPST_MultiButtonControl_String",
+                  "INPIDT_MultiButtonControl_ID",
+                  "INPIDT_ComboControl_ID")
+
+    def __init__(self, attrs):
+        self.data_type = attrs.get('INPS_DataType')
+
+        self.ids = dict()
+        for key in self.ID_KEYS:
+            for index, id in attrs.get(key, {}).items():
+                self.ids.setdefault(index, id)
+
+        self.indices = dict()
+        for key in self.INDEX_KEYS:
+            enum = dict((str(name), index) for index, name in
+                        attrs.get(key, {}).items())
+            for name, index in enum.items():
+                self.indices.setdefault(name, index)
+
+    def convert(self, value):
+        """Return `value` converted to the data type of the Input.
+
+        See `Input.set_value()` for the conversions.
+
+        """
+        data_type = self.data_type
+
+        # Setting boolean values doesn't work. So instead set an integer value
+        # allow settings checkboxes with True/False
+        if isinstance(value, bool):
+            value = int(value)
+
+        # Convert float/integer to enum if datatype == "FuID"
+        elif isinstance(value, (int, float)) and data_type == "FuID":
+
+            # We must compare it with a float value. We add 1 to interpret
+            # as zero based indices. (Zero would be 1.0 in the fusion id
+            # dictionary, etc.)
+            value = self.ids.get(float(value) + 1.0, value)
+
+        # Convert enum string value to its corresponding integer value
+        elif (isinstance(value, basestring) and
+                data_type != "Text" and
+                data_type != "FuID"):
+
+            index = self.indices.get(str(value))
+            if index is not None:
+                value = index - 1.0
+
+        return value
+
+    def settings_value(self, value):
+        """Return `value` converted as stored in the settings of a tool.
+
+        Returns:
+            The value for the "Value" of the Input in a settings table, or
+                None when it can't be set through the settings, eg. for
+                Image Inputs or values that don't match the data type.
+
+        """
+        value = self.convert(value)
+        if self.data_type == "Number":
+            if not isinstance(value, (int, float)):
+                return None
+            return float(value)
+        if self.data_type in ("Text", "FuID"):
+            if not isinstance(value, basestring):
+                return None
+            if self.data_type == "FuID":
+                return {'__ctor': "FuID", 1.0: value}
+            return value
+        return None
+
+
+class InputSchemaCache(object):
+    """Cache of the `InputSchema` per tool type and Input ID.
+
+    All Inputs with the same ID on tools of the same type share the same
+    data type and enum tables. So instead of fetching the attributes of the
+    Input each time they are needed (eg. for every `Input.set_value()`) the
+    schema is built once and looked up by (registry ID, input ID).
+
+    Groups and macros have user-defined Inputs that differ per instance, so
+    their schemas are never cached.
+
+    .. note::
+        If a tool populates its enum options dynamically clear the cache
+        with `input_schemas.clear()` after the options have changed.
+
+    """
+
+    UNCACHED_REG_IDS = ("GroupOperator", "MacroOperator")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._schemas = dict()
+
+    def get(self, key, input):
+        """Return the schema for `key`, built from `input` when missing.
+
+        Args:
+            key (tuple): The (registry ID, input ID) of the Input.
+            input (Input): The Input to build the schema from on a miss.
+
+        Returns:
+            InputSchema: The schema of the Input.
+
+        """
+        schema = self._schemas.get(key)
+        if schema is not None:
+            self.hits += 1
+            return schema
+
+        self.misses += 1
+        schema = InputSchema(input.get_attrs())
+        if key[0] not in self.UNCACHED_REG_IDS:
+            self._schemas[key] = schema
+        return schema
+
+    def cached(self, key):
+        """Return the schema for `key` when cached, without building it.
+
+        Args:
+            key (tuple): The (registry ID, input ID) of the Input.
+
+        Returns:
+            InputSchema or None: The schema, None when not cached.
+
+        """
+        schema = self._schemas.get(key)
+        if schema is not None:
+            self.hits += 1
+        return schema
+
+    def clear(self):
+        """Clear all cached schemas and reset the counters."""
+        self._schemas.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return the hit and miss counters of this cache.
+
+        Returns:
+            dict: The `hits`, `misses` and current `size` of the cache.
+
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._schemas)}
+
+
+class WriteBatch(object):
+    """A journal of writes to tools that are applied at once, see `Comp.batch()`
+
+    While a batch is active `Input.set_value()`, `Input.connect_to()`,
+    `Tool.rename()`, `Tool.clear_name()` and `Tool.set_tile_color()` only
+    record the write. When the batch is applied the writes are coalesced, only
+    the last value per Input and time, the last connection per Input and the
+    last name and tile color per tool are kept, and grouped per tool.
+    Connecting or disconnecting an Input replaces the values set on it
+    before, values set after it are kept.
+
+    Setting a value is a call per value, so the static values of a tool with
+    many values to set are applied with a single `SaveSettings()` and
+    `LoadSettings()` instead.
+
+    Attributes:
+        comp (Comp): The composition the writes are applied in.
+        writes (int): The amount of writes recorded.
+        calls (int): The amount of calls to Fusion made to apply them.
+
+    """
+
+    # The data types of Inputs of which the value can be set in the settings
+    SETTINGS_TYPES = ("Number", "Text", "FuID")
+
+    # Loading the settings of a tool takes two calls, so only use it for
+    # tools with at least this amount of values to set
+    MIN_SETTINGS_VALUES = 3
+
+    def __init__(self, comp):
+        self.comp = comp
+        self.writes = 0
+        self.calls = 0
+
+        # The writes by reference of the Input or Tool written to
+        self._values = OrderedDict()
+        self._connections = OrderedDict()
+        self._attrs = OrderedDict()
+        self._tile_colors = OrderedDict()
+
+    def set_value(self, input, value, time=None):
+        """Record setting the value of an Input, see `Input.set_value()`"""
+        if time is None:
+            # The time of `Comp.at_time()` is only known right now
+            time = getattr(_evaluation, 'time', None)
+
+        self.writes += 1
+        values = self._values.setdefault(input._reference,
+                                         (input, OrderedDict()))[1]
+        values.pop(time, None)
+        values[time] = value
+
+    def connect(self, input, output):
+        """Record connecting an Input, see `Input.connect_to()`"""
+        self.writes += 1
+        # Connections are applied before values, so the values set before
+        # the connection would be set after it otherwise
+        self._values.pop(input._reference, None)
+        self._connections[input._reference] = (input, output)
+
+    def set_attrs(self, tool, attrs):
+        """Record setting attributes of a tool, eg. by `Tool.rename()`"""
+        self.writes += 1
+        tool_attrs = self._attrs.setdefault(tool._reference, (tool, dict()))
+        tool_attrs[1].update(attrs)
+
+    def set_tile_color(self, tool, color):
+        """Record setting the tile color of a tool"""
+        self.writes += 1
+        self._tile_colors[tool._reference] = (tool, color)
+
+    def coalesced(self):
+        """Return the amount of writes left after coalescing them."""
+        return (sum(len(values) for _, values in self._values.values()) +
+                len(self._connections) + len(self._attrs) +
+                len(self._tile_colors))
+
+    def apply(self):
+        """Apply the recorded writes in a single undo chunk.
+
+        Connections are made first, then the values are set, then the tile
+        colors and names. This is done when leaving `Comp.batch()`.
+
+        """
+        misses = input_schemas.misses
+        with context.lock_and_undo_chunk(self.comp, "Batch"):
+            # Locking and the undo chunk
+            self.calls += 4
+
+            for input, output in self._connections.values():
+                input.connect_to(output)
+                self.calls += 1
+
+            # Values without a time are set at the current time, which is
+            # looked up only once
+            time = getattr(_evaluation, 'time', None)
+            if time is None and any(None in values for _, values
+                                    in self._values.values()):
+                time = self.comp.get_current_time()
+                self.calls += 1
+            if time is None:
+                self._apply_values()
+            else:
+                with self.comp.at_time(time):
+                    self._apply_values()
+
+            for tool, color in self._tile_colors.values():
+                tool.set_tile_color(color)
+                self.calls += 1
+
+            for tool, attrs in self._attrs.values():
+                tool.set_attrs(attrs)
+                self.calls += 1
+
+        # Building the schemas of Inputs to convert the values
+        self.calls += input_schemas.misses - misses
+
+    def _apply_values(self):
+        writes = list(self._values.values())
+        if len(writes) >= self.MIN_SETTINGS_VALUES:
+            by_tool = OrderedDict()
+            for input, values in writes:
+                if getattr(input, '_tool', None) is None:
+                    input._tool = input.tool()
+                    self.calls += 1
+                tool = input._tool
+                by_tool.setdefault(tool._reference, (tool, []))[1].append(
+                    (input, values))
+
+            writes = []
+            for tool, inputs in by_tool.values():
+                writes.extend(self._load_values(tool, inputs))
+
+        for input, values in writes:
+            for time, value in values.items():
+                input.set_value(value, time)
+                self.calls += 1
+
+    def _load_values(self, tool, inputs):
+        """Set the static values of a tool's Inputs through its settings.
+
+        Returns:
+            list: The (Input, values) that still need to be set directly, eg.
+                because they're animated or connected.
+
+        """
+        static = [(input, values) for input, values in inputs
+                  if input.schema().data_type in self.SETTINGS_TYPES]
+        if len(static) < self.MIN_SETTINGS_VALUES:
+            return inputs
+
+        settings = tool.save_settings()
+        self.calls += 1
+        tool_settings = self._tool_settings(settings, tool)
+        if tool_settings is None:
+            return inputs
+
+        inputs_settings = tool_settings.get('Inputs')
+        if not isinstance(inputs_settings, dict):
+            inputs_settings = tool_settings['Inputs'] = dict()
+
+        direct = [(input, values) for input, values in inputs
+                  if input.schema().data_type not in self.SETTINGS_TYPES]
+        for input, values in static:
+            input_settings = inputs_settings.get(input._schema_key[1])
+            if not isinstance(input_settings, dict):
+                input_settings = {'__ctor': "Input"}
+            elif ('SourceOp' in input_settings or
+                    'Expression' in input_settings):
+                # The value of animated and connected Inputs differs per time
+                direct.append((input, values))
+                continue
+
+            # A static Input has the same value at every time
+            value = input.schema().settings_value(list(values.values())[-1])
+            if value is None:
+                direct.append((input, values))
+                continue
+
+            input_settings = dict(input_settings)
+            input_settings['Value'] = value
+            inputs_settings[input._schema_key[1]] = input_settings
+
+        tool.load_settings(settings)
+        self.calls += 1
+        return direct
+
+    def _tool_settings(self, settings, tool):
+        """Return the settings of `tool` from its saved settings table."""
+        tools = (settings or {}).get('Tools') or {}
+        entries = [value for value in tools.values() if isinstance(value, dict)]
+        if len(entries) == 1:
+            return entries[0]
+
+        self.calls += 1
+        entry = tools.get(tool.name())
+        return entry if isinstance(entry, dict) else None
+
+    def stats(self):
+        """Return the amount of writes and calls of this batch.
+
+        Returns:
+            dict: The recorded `writes`, the writes left after coalescing
+                (`coalesced`), the `calls` made to apply them and the calls
+                `saved` compared to applying each write directly, at least 0.
+
+        """
+        return {'writes': self.writes,
+                'coalesced': self.coalesced(),
+                'calls': self.calls,
+                'saved': max(0, self.writes - self.calls)}
+
+    def report(self):
+        """Return a readable summary of `stats()`."""
+        return ("{writes} writes, {coalesced} after coalescing, applied with "
+                "{calls} calls ({saved} calls saved)".format(**self.stats()))
 
 
 class PyObject(object):
@@ -38,7 +730,11 @@ class PyObject(object):
         
     """
 
-    _reference = None   # reference to PyRemoteObject
+    # Wrappers only hold the reference to the PyRemoteObject (and its cached
+    # attributes), so they don't carry a per-instance __dict__. The
+    # __weakref__ slot allows them to be stored in the `IdentityMap`.
+    __slots__ = ('_reference', '_attrs_snapshot', '__weakref__')
+
     _default_reference = None
 
     def __new__(cls, *args, **kwargs):
@@ -64,49 +760,12 @@ class PyObject(object):
                 raise ValueError("Can't instantiate a PyObject with a "
                                  "reference to None")
 
-        # Python crashes whenever you perform `type()` or `dir()` on the
-        # PeyeonScript.scripapp() retrieved applications. As such we try to
-        # get the attributes before that check before type-checking in case
-        # of errors.
-        attrs = None
-        try:
-            attrs = reference.GetAttrs()
-        except AttributeError:
-            # Check if the reference is a PyRemoteObject.
-            # Since we don't have access to the class type that fusion returns
-            # outside of Fusion we use a hack based on its name
-            if type(reference).__name__ != 'PyRemoteObject':
-                raise TypeError("Reference is not of type PyRemoteObject "
-                                "but {0}".format(type(reference).__name__))
-
-        newcls = None
-        if attrs:
-            # Acquire an attribute to check for type (start prefix)
-            # Comp, Tool, Input, Output, View, etc. all return attributes
-            # that define its type
-            data_type = next(iter(attrs))
-
-            # Define the new class type
-            if data_type.startswith("COMP"):
-                newcls = Comp
-            elif data_type.startswith("TOOL"):
-                newcls = Tool
-            elif data_type.startswith("INP"):
-                newcls = Input
-            elif data_type.startswith("OUT"):
-                newcls = Output
-            elif data_type.startswith("VIEW"):
-                newcls = Flow
-            elif data_type.startswith("FUSION"):
-                newcls = Fusion
-
+        # Return the existing wrapper if the remote object is already wrapped
+        existing = identity_map.get(reference)
+        if existing is not None:
+            newcls = type(existing)
         else:
-            # Image (output value) does not return attributes from GetAttrs()
-            # so we use some data from the PyRemoteObject
-            str_data_type = str(reference).split(' ', 1)[0]
-
-            if str_data_type == "Image":
-                newcls = Image
+            newcls = type_cache.resolve(reference)
 
         # Ensure we convert to a type preferred by the user
         # eg. Tool() would come out as Comp() since no arguments are provided.
@@ -117,10 +776,15 @@ class PyObject(object):
                                 "type. '{0}' is not an instance "
                                 "of '{1}'".format(newcls, cls))
 
+        if existing is not None:
+            return existing
+
         # Instantiate class and return
         if newcls:
             klass = super(PyObject, cls).__new__(newcls)
             klass._reference = reference
+            klass._attrs_snapshot = None
+            identity_map.add(klass)
             return klass
 
         return None
@@ -129,14 +793,59 @@ class PyObject(object):
         self.set_attrs({key: value})
 
     def get_attr(self, key):
-        attrs = self.get_attrs()
-        return attrs[key]
+        """Return the value of a single attribute.
+
+        Args:
+            key (str): The attribute to return, eg. "TOOLS_Name"
+
+        Returns:
+            The value of the attribute.
+
+        """
+        if attrs_cache.ttl is None:
+            # Only fetch the single value instead of the full table
+            value = self._reference.GetAttrs(key)
+            if value is None:
+                raise KeyError(key)
+            return value
+
+        return attrs_cache.get(self)[key]
 
     def set_attrs(self, attr_values):
+        self.invalidate_attrs()
         self._reference.SetAttrs(attr_values)
 
-    def get_attrs(self):
-        return self._reference.GetAttrs()
+    def get_attrs(self, keys=None):
+        """Return the attributes of this object.
+
+        When enabled the attributes are served from the `attrs_cache`.
+
+        Args:
+            keys (list or None): When provided only these attributes are
+                fetched and returned, with a small call per key instead of
+                fetching the full table. Keys that the object doesn't have
+                are left out.
+
+        Returns:
+            dict: The attributes.
+
+        """
+        if keys is not None and attrs_cache.ttl is None:
+            attrs = dict()
+            for key in keys:
+                value = self._reference.GetAttrs(key)
+                if value is not None:
+                    attrs[key] = value
+            return attrs
+
+        attrs = attrs_cache.get(self)
+        if keys is None:
+            return dict(attrs)
+        return dict((key, attrs[key]) for key in keys if key in attrs)
+
+    def invalidate_attrs(self):
+        """Discard the cached attributes of this object, if any."""
+        self._attrs_snapshot = None
 
     def set_data(self, name, value):
         """ Set persistent data on this object.
@@ -271,6 +980,11 @@ class PyObject(object):
             added a raise a more explanatory error if we retrieve unknown data.
 
         """
+        if attr.startswith('_'):
+            # Private attributes are ours (eg. unset slots), there's no need
+            # to ask Fusion for them and it avoids recursing into this method
+            raise AttributeError(attr)
+
         result = getattr(self._reference, attr)
         if result is None:
             raise AttributeError("{0} object has no attribute "
@@ -291,6 +1005,8 @@ class Comp(PyObject):
 
     Here you can perform the global changes to the current composition.
     """
+    __slots__ = ()
+
     # TODO: Implement the rest of the `Comp` methods and its documentations.
 
     @staticmethod
@@ -327,6 +1043,31 @@ class Comp(PyObject):
         except RuntimeError:
             pass
 
+    def cached_attrs(self, ttl=None):
+        """Return a context in which attributes of objects are cached.
+
+        Inside the context `get_attr()` and `get_attrs()` fetch the
+        attributes of each object only once. Any `set_attrs()` invalidates
+        the cached attributes of that object.
+
+        .. note::
+            This enables the `attrs_cache` for all objects, not only for
+            those belonging to this composition.
+
+        Example
+            >>> c = Comp()
+            >>> with c.cached_attrs():
+            >>>     for tool in c.get_tool_list():
+            >>>         name = tool.get_attr("TOOLS_Name")
+            >>>         reg_id = tool.get_attr("TOOLS_RegID")
+
+        Args:
+            ttl (float or None): Seconds the attributes stay cached. When None
+                they stay cached for the whole context.
+
+        """
+        return attrs_cache.scope(ttl)
+
     def get_current_time(self):
         """ Returns the current time in this composition.
 
@@ -335,6 +1076,85 @@ class Comp(PyObject):
         """
         return self._reference.CurrentTime
 
+    @contextlib.contextmanager
+    def at_time(self, time=None):
+        """Use a fixed time for Input and Output values within this context.
+
+        Getting or setting a value without a time looks up the current
+        time of the comp each time. Within this context the given time is
+        used instead, for all Inputs and Outputs in the current thread.
+
+        Example
+            >>> c = Comp()
+            >>> with c.at_time(1001):
+            >>>     for tool in c.get_tool_list():
+            >>>         print tool.input("Blend").get_value()
+
+        Args:
+            time (float or None): The time to use. When None the current time
+                of this comp is looked up once and used.
+
+        """
+        if time is None:
+            time = self.get_current_time()
+
+        previous = getattr(_evaluation, 'time', None)
+        _evaluation.time = time
+        try:
+            yield
+        finally:
+            _evaluation.time = previous
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Record writes to tools within this context and apply them at once.
+
+        Within the context `Input.set_value()`, `Input.connect_to()`,
+        `Tool.rename()`, `Tool.clear_name()` and `Tool.set_tile_color()` are
+        recorded for the current thread instead of applied right away. When
+        leaving the context the writes are coalesced and applied with as few
+        calls as possible in a single undo chunk, see `WriteBatch`.
+
+        When an error is raised inside the context the recorded writes are
+        discarded. Batches inside a batch are applied with the outer batch,
+        which must be of the same composition.
+
+        .. note::
+            Reading values inside the context returns the values from before
+            the batch, since nothing is written until leaving it.
+
+        Example
+            >>> c = Comp()
+            >>> with c.batch() as batch:
+            >>>     for tool in c.get_tool_list(node_type="Blur"):
+            >>>         tool.input("XBlurSize").set_value(2.0)
+            >>>         tool.set_tile_color({'R': 1.0, 'G': 0.0, 'B': 0.0})
+            >>> print batch.report()
+
+        Yields:
+            WriteBatch: The batch the writes are recorded in.
+
+        Raises:
+            RuntimeError: When a batch of another composition is active.
+
+        """
+        batch = getattr(_batching, 'batch', None)
+        if batch is not None:
+            if (batch.comp is not self and
+                    batch.comp._reference != self._reference):
+                raise RuntimeError("A batch of another composition is "
+                                   "active: {0}".format(batch.comp))
+            yield batch
+            return
+
+        batch = WriteBatch(self)
+        _batching.batch = batch
+        try:
+            yield batch
+        finally:
+            _batching.batch = None
+        batch.apply()
+
     def get_tool_list(self, selected=False, node_type=None):
         """ Returns the tool list of this composition.
 
@@ -352,6 +1172,73 @@ class Comp(PyObject):
         return [Tool(x) for x in self._reference.GetToolList(selected,
                                                              *args).values()]
 
+    def snapshot(self, tools=None, changes="settings"):
+        """Return a read-only model of the node graph of this composition.
+
+        The model is built in one pass and can be queried afterwards without
+        any calls to Fusion. Use `CompSnapshot.refresh()` to update it after
+        changes. See `fusionless.graph.CompSnapshot`.
+
+        Args:
+            tools (list or None): The tools to include. When None all tools
+                in the composition are included.
+            changes (str or None): How a refresh detects changed tools, see
+                `CompSnapshot.build()`.
+
+        Returns:
+            CompSnapshot: The snapshot of the composition.
+
+        """
+        from .graph import CompSnapshot
+        return CompSnapshot.build(self, tools=tools, changes=changes)
+
+    def topological_order(self, tools=None, data_type=None):
+        """Return the tools ordered so each tool comes after its inputs.
+
+        Only connections between the given tools are considered. Tools that
+        are part of a cycle (eg. through expressions) can't be ordered and
+        are returned last, in their original order.
+
+        Args:
+            tools (list or None): The tools to order. When None all tools in
+                the composition are ordered.
+            data_type (str, list or None): Only consider connections of these
+                data types, eg. "Image". When None all connections are
+                considered.
+
+        Returns:
+            list: The Tools, upstream tools first.
+
+        """
+        if tools is None:
+            tools = self.get_tool_list()
+
+        walker = _ConnectionWalker(data_type)
+        included = set(tool._reference for tool in tools)
+        pending = dict()        # tool reference -> unordered source count
+        targets = dict()        # tool reference -> Tools it's a source of
+        for tool in tools:
+            sources = [source for source in walker.sources(tool)
+                       if source._reference in included]
+            pending[tool._reference] = len(sources)
+            for source in sources:
+                targets.setdefault(source._reference, []).append(tool)
+
+        # Tools are appended once all their sources are ordered, so this
+        # loop also visits the tools appended while looping
+        ordered = [tool for tool in tools if not pending[tool._reference]]
+        for tool in ordered:
+            for target in targets.get(tool._reference, ()):
+                pending[target._reference] -= 1
+                if not pending[target._reference]:
+                    ordered.append(target)
+
+        if len(ordered) < len(tools):
+            done = set(tool._reference for tool in ordered)
+            ordered.extend(tool for tool in tools
+                           if tool._reference not in done)
+        return ordered
+
     def get_selected_tools(self, node_type=None):
         """Returns the currently selected tools.
 
@@ -378,6 +1265,75 @@ class Comp(PyObject):
         """
         return self.CurrentFrame
 
+    def flow(self):
+        """Return the Flow of the currently active ChildFrame.
+
+        Returns:
+            Flow: The node view of this Composition.
+
+        """
+        flow = Flow(self.current_frame().FlowView)
+        flow._comp = self
+        return flow
+
+    @contextlib.contextmanager
+    def layout(self):
+        """Queue the positions set with `Tool.set_pos()` within this context.
+
+        Each `Tool.set_pos()` moves a tool right away, which makes moving many
+        tools slow. Within this context the Flow is looked up once and the
+        moves are recorded for the current thread. When leaving the context
+        the last move of each tool is queued with `Flow.queue_set_pos()` and
+        all tools are moved at once. When an error is raised inside the
+        context the recorded moves are discarded, like with `batch()`.
+
+        `Tool.get_pos()` returns the queued position of tools moved within
+        the context.
+
+        Layouts inside a layout of the same composition are moved with the
+        outer layout.
+
+        .. note::
+            Only use this for tools of this composition, since the moves are
+            queued in the Flow of this composition.
+
+        Example
+            >>> c = Comp()
+            >>> with c.layout():
+            >>>     for i, tool in enumerate(c.get_tool_list()):
+            >>>         tool.set_pos((i % 10, i // 10))
+
+        Yields:
+            Flow: The Flow the moves are queued in.
+
+        Raises:
+            RuntimeError: When a layout of another composition is active.
+
+        """
+        flow = getattr(_layout, 'flow', None)
+        if flow is not None:
+            comp = _layout.comp
+            if comp is not self and comp._reference != self._reference:
+                raise RuntimeError("A layout of another composition is "
+                                   "active: {0}".format(comp))
+            yield flow
+            return
+
+        flow = self.flow()
+        _layout.comp = self
+        _layout.flow = flow
+        _layout.queued = queued = OrderedDict()
+        try:
+            yield flow
+        finally:
+            _layout.comp = None
+            _layout.flow = None
+            _layout.queued = None
+
+        for tool, pos in queued.values():
+            flow.queue_set_pos(tool, pos)
+        flow.flush_set_pos_queue()
+
     def get_active_tool(self):
         """ Return active tool.
 
@@ -439,6 +1395,153 @@ class Comp(PyObject):
 
         return tool
 
+    def _unique_name(self, base, taken, counters, numbered=False):
+        """Return a name starting with `base` that no tool in the comp has.
+
+        Args:
+            base (str): The name to use when free or to number otherwise,
+                eg. "Merge1_1" for "Merge1".
+            taken (set): The names of the tools in the comp and the names
+                already picked.
+            counters (dict): The next number to try by `base`, shared between
+                calls so numbers aren't tried twice.
+            numbered (bool): Always append a number like Fusion numbers new
+                tools, eg. "Blur1" for "Blur".
+
+        """
+        name = None if numbered else base
+        pattern = "{0}{1}" if numbered else "{0}_{1}"
+        while name is None or name in taken:
+            number = counters.get(base, 1)
+            counters[base] = number + 1
+            name = pattern.format(base, number)
+        taken.add(name)
+        return name
+
+    def create_tools(self, specs):
+        """Create many tools at once with a single paste.
+
+        Instead of adding, renaming, setting and connecting each tool with
+        separate calls, the settings of all tools are built in Python (see
+        `SettingsBuilder`) and pasted into the comp at once.
+
+        Each spec is a dictionary with:
+            type (str): The type id of the node to create.
+            name (str, optional): The name of the tool. When taken a number
+                is appended. Defaults to the type with a number, eg. "Blur1".
+            inputs (dict, optional): The value of Inputs by ID, converted
+                like `Input.set_value()` does.
+            connect (dict, optional): What to connect to Inputs by ID: the key
+                of another spec or an existing Tool, or a 2-tuple with either
+                and the ID of its Output. The main "Output" is used otherwise.
+            pos (tuple, optional): The (x, y) position in the Flow.
+
+        Example
+            >>> tools = comp.create_tools({
+            >>>     "plate": {"type": "Loader", "pos": (0, 0)},
+            >>>     "blur": {"type": "Blur", "inputs": {"XBlurSize": 2.0},
+            >>>              "connect": {"Input": "plate"}, "pos": (1, 0)}
+            >>> })
+            >>> print tools["blur"].name()
+
+        Input values are converted with the schema of the Input (see
+        `InputSchemaCache`) and set in the pasted settings. When the schema
+        isn't cached yet, eg. the first time a type of tool is created,
+        numbers and booleans are written to the settings as they are, so
+        pass the ID of the option of FuID Inputs as a string. Other values
+        are set after pasting, with the schema built once per tool type and
+        Input ID.
+
+        The names of the tools in the comp are read from a single copy of
+        their settings. Resolving the pasted tools is a call per tool.
+
+        Args:
+            specs (dict): The spec for each tool by key.
+
+        Returns:
+            dict: The created Tool instances by the key of their spec.
+
+        Raises:
+            ValueError: When a Tool to connect to has no Output with the ID.
+            RuntimeError: When a pasted tool can't be found by its name.
+
+        """
+        builder = SettingsBuilder()
+        names = dict()
+        existing = self.get_tool_list()
+        taken = set(tools_by_name(self.copy_settings(existing))
+                    if existing else [])
+        counters = dict()
+        deferred = []
+        for key, spec in specs.items():
+            reg_id = spec['type']
+            if spec.get('name'):
+                name = self._unique_name(spec['name'], taken, counters)
+            else:
+                name = self._unique_name(reg_id, taken, counters,
+                                         numbered=True)
+            names[key] = name
+
+            inputs = dict()
+            for input_id, value in (spec.get('inputs') or {}).items():
+                if isinstance(value, (dict, list, tuple)):
+                    # Settings tables and points are set as they are
+                    inputs[input_id] = value
+                    continue
+                schema = input_schemas.cached((reg_id, input_id))
+                if schema is not None:
+                    value = schema.settings_value(value)
+                    if value is not None:
+                        inputs[input_id] = value
+                        continue
+                elif isinstance(value, (int, float)):
+                    inputs[input_id] = float(value)
+                    continue
+                deferred.append((key, input_id, spec['inputs'][input_id]))
+            builder.add_tool(reg_id, name, inputs=inputs, pos=spec.get('pos'))
+
+        # Connections between the specs are part of the settings, those to
+        # existing tools are made after pasting
+        external = []
+        for key, spec in specs.items():
+            for input_id, source in (spec.get('connect') or {}).items():
+                output_id = "Output"
+                if isinstance(source, tuple):
+                    source, output_id = source
+                if isinstance(source, Tool):
+                    output = source.output(output_id)
+                    if output is None:
+                        raise ValueError("{0} has no Output: {1}".format(
+                            source.name(), output_id))
+                    external.append((key, input_id, output))
+                else:
+                    builder.connect(names[source], names[key],
+                                    input=input_id, output=output_id)
+
+        with context.lock_and_undo_chunk(self, "Create tools"):
+            self.paste(builder.settings())
+
+            # Pasted tools are selected
+            pasted = dict((tool.name(), tool)
+                          for tool in self.get_tool_list(selected=True))
+            missing = [name for name in names.values() if name not in pasted]
+            if missing:
+                raise RuntimeError("Pasted tools not found, they may have "
+                                   "been renamed: {0}".format(
+                                       ", ".join(sorted(missing))))
+            tools = dict((key, pasted[name]) for key, name in names.items())
+
+            if deferred:
+                # Only the first Input per tool type and ID builds a schema
+                with self.at_time(getattr(_evaluation, 'time', None)):
+                    for key, input_id, value in deferred:
+                        tools[key].input(input_id).set_value(value)
+
+            for key, input_id, output in external:
+                tools[key].input(input_id).connect_to(output)
+
+        return tools
+
     def copy(self, tools):
         """Copy a list of tools to the Clipboard.
 
@@ -451,20 +1554,93 @@ class Comp(PyObject):
         """
         return self._reference.Copy([tool._reference for tool in tools])
 
+    def copy_settings(self, tools):
+        """Return the settings table of a list of tools.
+
+        This is the table `copy` puts on the Clipboard, which can be passed
+        to `paste`, without touching the Clipboard.
+
+        Args:
+            tools (list): The Tools to return the settings of.
+
+        Returns:
+            dict: The settings table of the tools.
+
+        """
+        return self._reference.CopySettings([tool._reference
+                                             for tool in tools])
+
     def paste(self, settings=None):
         """Pastes a tool from the Clipboard or a settings table.
 
         Args:
-            settings (dict or None): If settings dictionary provided it will be
-                used as the settings table to be copied, instead of using the
-                Comp's current clipboard.
+            settings (dict or None): If settings dictionary provided it will be
+                used as the settings table to be copied, instead of using the
+                Comp's current clipboard.
+
+        Returns:
+            None
+
+        """
+        args = tuple() if settings is None else (settings,)
+        return self._reference.Paste(*args)
+
+    def set_values(self, values, interpolation="smooth", replace=False):
+        """Set keyframes on many Inputs at once in a single undo chunk.
+
+        See `Input.set_values()`.
+
+        Example
+            >>> c = Comp()
+            >>> tool = c.get_active_tool()
+            >>> frames = range(1001, 1101)
+            >>> c.set_values({tool.input("Size"): (frames, sizes),
+            >>>               tool.input("Angle"): (frames, angles)})
+
+        Args:
+            values (dict): Mapping from Input to a (times, values) 2-tuple.
+            interpolation (str): The interpolation between the keys, either
+                "smooth", "linear" or "step".
+            replace (bool): When True existing keys are removed, otherwise
+                the new keys are merged with them.
+
+        """
+        with context.lock_and_undo_chunk(self, "Set values"):
+            for input, (times, input_values) in values.items():
+                input = Input(input)
+                input.set_values(times, input_values,
+                                 interpolation=interpolation,
+                                 replace=replace)
+
+    def remove_keyframes(self, inputs, time=None, index=None):
+        """Remove keyframes from many Inputs in a single undo chunk.
+
+        See `Input.remove_keyframes()`.
+
+        Example
+            >>> c = Comp()
+            >>> inputs = [i for tool in c.get_selected_tools()
+            >>>           for i in tool.inputs()]
+            >>> c.remove_keyframes(inputs, time=(1001, 1010))
+
+        Args:
+            inputs (list): The Inputs to remove the keys from.
+            time (float, tuple or list): A single time, a (start, end) tuple
+                for an inclusive range of times or any other sequence of
+                times, eg. a list, set, range or NumPy array.
+            index (int or list): Index or list of indices of the keys, in
+                order of time.
 
         Returns:
-            None
+            int: The total amount of removed keys.
 
         """
-        args = tuple() if settings is None else (settings,)
-        return self._reference.Paste(*args)
+        removed = 0
+        with context.lock_and_undo_chunk(self, "Remove keyframes"):
+            for input in inputs:
+                input = Input(input)
+                removed += input.remove_keyframes(time=time, index=index)
+        return removed
 
     def lock(self):
         """Sets the composition to a locked state.
@@ -789,12 +1965,116 @@ class Comp(PyObject):
             str: Full path to current comp. (empty string if not saved yet)
 
         """
-        return self._reference.GetAttrs()['COMPS_FileName']
+        return self.get_attr('COMPS_FileName')
 
     def __repr__(self):
         return '{0}("{1}")'.format(self.__class__.__name__, self.filename())
 
 
+class _ConnectionWalker(object):
+    """Walks the connections between tools, querying each tool only once.
+
+    The direct upstream and downstream tools of each visited tool are
+    memoized, so tools shared by several branches (or several walks with the
+    same walker) don't query Fusion again.
+
+    Args:
+        data_type (str, list or None): Only follow connections of these data
+            types, eg. "Image". When None all connections are followed.
+
+    """
+
+    def __init__(self, data_type=None):
+        if isinstance(data_type, basestring):
+            data_type = [data_type]
+        self.data_types = set(data_type) if data_type is not None else None
+        self._sources = dict()      # tool reference -> list of Tools
+        self._targets = dict()      # tool reference -> list of Tools
+
+    def sources(self, tool):
+        """Return the tools connected to the inputs of `tool`."""
+        sources = self._sources.get(tool._reference)
+        if sources is not None:
+            return sources
+
+        sources = []
+        seen = set()
+        for input in tool.inputs():
+            output = input._reference.GetConnectedOutput()
+            if not output:
+                continue
+            if self.data_types is not None:
+                if getattr(input, '_schema_key', None) is None:
+                    input._schema_key = (tool.reg_id(), input._reference.ID)
+                if input.schema().data_type not in self.data_types:
+                    continue
+            source = output.GetTool()
+            if source not in seen:
+                seen.add(source)
+                sources.append(Tool(source))
+
+        self._sources[tool._reference] = sources
+        return sources
+
+    def targets(self, tool):
+        """Return the tools connected to the outputs of `tool`."""
+        targets = self._targets.get(tool._reference)
+        if targets is not None:
+            return targets
+
+        targets = []
+        seen = set()
+        for output in tool.outputs():
+            inputs = output._reference.GetConnectedInputs()
+            if not inputs:
+                continue
+            if (self.data_types is not None and
+                    output.data_type() not in self.data_types):
+                continue
+            for input in inputs.values():
+                target = input.GetTool()
+                if target not in seen:
+                    seen.add(target)
+                    targets.append(Tool(target))
+
+        self._targets[tool._reference] = targets
+        return targets
+
+    def walk(self, tool, neighbours, depth=None):
+        """Return the tools reachable from `tool`, breadth-first.
+
+        Each tool is visited once, so cycles (eg. through expressions) are
+        safe.
+
+        Args:
+            tool (Tool): The tool to start from. It's not included.
+            neighbours (callable): Returns the next tools for a tool, eg.
+                `self.sources`.
+            depth (int or None): The maximum amount of connections to
+                follow. When None there's no limit.
+
+        Returns:
+            list: The reachable Tools, nearest first.
+
+        """
+        visited = set([tool._reference])
+        result = []
+        frontier = [tool]
+        level = 0
+        while frontier and (depth is None or level < depth):
+            level += 1
+            next_frontier = []
+            for current in frontier:
+                for other in neighbours(current):
+                    if other._reference in visited:
+                        continue
+                    visited.add(other._reference)
+                    result.append(other)
+                    next_frontier.append(other)
+            frontier = next_frontier
+        return result
+
+
 class Tool(PyObject):
     """A Tool is a single operator/node in your composition.
 
@@ -804,6 +2084,23 @@ class Tool(PyObject):
 
     """
 
+    __slots__ = ('_reg_id', '_outputs_by_id')
+
+    def reg_id(self):
+        """Return the registry ID of this Tool's type, eg. "Background".
+
+        The type of a tool can't change so the value is fetched only once.
+
+        Returns:
+            str: The registry ID of the tool.
+
+        """
+        reg_id = getattr(self, '_reg_id', None)
+        if reg_id is None:
+            reg_id = self.get_attr('TOOLS_RegID')
+            self._reg_id = reg_id
+        return reg_id
+
     def get_pos(self):
         """Return the X and Y position of this tool in the FlowView.
 
@@ -811,13 +2108,21 @@ class Tool(PyObject):
             list(float, float): The X and Y coordinate of the tool.
 
         """
-        flow = self.comp().current_frame().FlowView
-        # possible optimization: self._reference.Comp.CurrentFrame.FlowView
-        return flow.GetPosTable(self._reference).values()
+        flow = getattr(_layout, 'flow', None)
+        if flow is not None:
+            move = _layout.queued.get(self._reference)
+            if move is not None:
+                return list(move[1])
+            flow = flow._reference
+        else:
+            flow = self._reference.Composition.CurrentFrame.FlowView
+        return list(flow.GetPosTable(self._reference).values())
 
     def set_pos(self, pos):
         """Reposition this tool.
 
+        Within `Comp.layout()` the move is queued until leaving the context.
+
         Arguments:
             pos (list(float, float)):  The X and Y coordinate to apply.
 
@@ -825,8 +2130,13 @@ class Tool(PyObject):
             None
 
         """
-        flow = self.comp().current_frame().FlowView
-        # possible optimization: self._reference.Comp.CurrentFrame.FlowView
+        flow = getattr(_layout, 'flow', None)
+        if flow is not None:
+            # Queued and moved when leaving `Comp.layout()`
+            _layout.queued[self._reference] = (self, pos)
+            return
+
+        flow = self._reference.Composition.CurrentFrame.FlowView
         flow.SetPos(self._reference, *pos)
 
     # region inputs
@@ -855,7 +2165,13 @@ class Tool(PyObject):
             Input: input at the given index.
 
         """
-        return Input(self._reference[id])
+        input = Input(self._reference[id])
+        if getattr(input, '_schema_key', None) is None:
+            # We already know what the input is, so `Input.schema()` won't
+            # need to ask Fusion for it.
+            input._schema_key = (self.reg_id(), id)
+        input._tool = self
+        return input
 
     def inputs(self):
         """Return all Inputs of this Tools
@@ -886,19 +2202,41 @@ class Tool(PyObject):
     def output(self, id):
         """ Returns the Output knob by ID.
 
+        The Outputs of a tool are indexed by ID as they're looked up, so
+        looking up an Output by ID doesn't query Fusion again until the tool
+        is refreshed.
+
         Arguments:
             id (str): ID name of the output.
 
         Returns:
-            Output: The resulting output.
+            Output: The resulting output, None if no output has that ID.
 
         """
-        # TODO: Optimize: there must be a more optimized way than this.
-        output_reference = next(x for x in self.outputs() if x.ID == id)
-        if not output_reference:
-            return None
+        outputs_by_id = getattr(self, '_outputs_by_id', None)
+        if outputs_by_id is None:
+            outputs_by_id = dict()
+            self._outputs_by_id = outputs_by_id
+        elif id in outputs_by_id:
+            return outputs_by_id[id]
+
+        # Fusion exposes the Inputs and Outputs of a tool as attributes by
+        # their ID, so a single call finds the Output
+        reference = getattr(self._reference, id, None)
+        if reference and type_cache.resolve(reference) is Output:
+            output = Output(reference)
         else:
-            return Output(output_reference)
+            # No Output, or an Input with the same ID. Reading the ID of
+            # each Output is a call per Output, so only search the list
+            # until the Output is found.
+            output = None
+            for reference in self._reference.GetOutputList().values():
+                if reference.ID == id:
+                    output = Output(reference)
+                    break
+
+        outputs_by_id[id] = output
+        return output
 
     def outputs(self):
         """ Return all Outputs of this Tools """
@@ -992,6 +2330,39 @@ class Tool(PyObject):
             or from this Tool.
         """
         return list(self.connections_iter(inputs=inputs, outputs=outputs))
+
+    def upstream(self, depth=None, data_type=None):
+        """Return all tools upstream of this Tool.
+
+        Each tool is returned once, even when it's reached through multiple
+        branches, and cycles (eg. through expressions) are safe.
+
+        Args:
+            depth (int or None): The maximum amount of connections to follow,
+                eg. 1 for only the tools directly connected to the inputs.
+                When None there's no limit.
+            data_type (str, list or None): Only follow connections of these
+                data types, eg. "Image". When None all connections are
+                followed.
+
+        Returns:
+            list: The upstream Tools, nearest first.
+
+        """
+        walker = _ConnectionWalker(data_type)
+        return walker.walk(self, walker.sources, depth=depth)
+
+    def downstream(self, depth=None, data_type=None):
+        """Return all tools downstream of this Tool.
+
+        See `Tool.upstream()` for the arguments.
+
+        Returns:
+            list: The downstream Tools, nearest first.
+
+        """
+        walker = _ConnectionWalker(data_type)
+        return walker.walk(self, walker.targets, depth=depth)
     # endregion
 
     def rename(self, name):
@@ -1001,11 +2372,18 @@ class Tool(PyObject):
             name (str): The new name to change to.
 
         """
-        self._reference.SetAttrs({'TOOLB_NameSet': True, 'TOOLS_Name': name})
+        self._set_name_attrs({'TOOLB_NameSet': True, 'TOOLS_Name': name})
 
     def clear_name(self):
         """Clears user-defined name reverting to automated internal name."""
-        self._reference.SetAttrs({'TOOLB_NameSet': False, 'TOOLS_Name': ''})
+        self._set_name_attrs({'TOOLB_NameSet': False, 'TOOLS_Name': ''})
+
+    def _set_name_attrs(self, attrs):
+        batch = getattr(_batching, 'batch', None)
+        if batch is not None:
+            batch.set_attrs(self, attrs)
+            return
+        self.set_attrs(attrs)
 
     def delete(self):
         """Removes the tool from the composition.
@@ -1015,6 +2393,12 @@ class Tool(PyObject):
             setting it to None. As such it invalidates this Tool instance.
 
         """
+        type_cache.discard(self._reference)
+        identity_map.discard(self._reference)
+        for output in (getattr(self, '_outputs_by_id', None) or {}).values():
+            if output is not None:
+                type_cache.discard(output._reference)
+                identity_map.discard(output._reference)
         self._reference.Delete()
 
     def refresh(self):
@@ -1024,14 +2408,18 @@ class Tool(PyObject):
             Internally calling Refresh in Fusion will invalidate the handle to
             internal object this tool references. You'd have to save the new
             handle that is returned (even though the documentation says nothing
-            is returned). Calling this function on this Tool will invalidate
-            other Tool instances referencing this same object. But it will
-            update the reference in this instance on which the function call
-            is made.
+            is returned). Since there's only a single Tool instance for each
+            Fusion object (see `IdentityMap`) the reference is updated on that
+            one instance, so it stays valid.
 
         """
+        type_cache.discard(self._reference)
+        identity_map.discard(self._reference)
         new_ref = self._reference.Refresh()
         self._reference = new_ref
+        self.invalidate_attrs()
+        self._outputs_by_id = None
+        identity_map.add(self)
 
     def parent(self):
         """Return the parent Group this Tool belongs to, if any."""
@@ -1115,6 +2503,10 @@ class Tool(PyObject):
             >>> tool.set_tile_color(None)   # reset
 
         """
+        batch = getattr(_batching, 'batch', None)
+        if batch is not None:
+            batch.set_tile_color(self, color)
+            return
         self._reference.TileColor = color
 
     def get_keyframes(self):
@@ -1155,6 +2547,9 @@ class Flow(PyObject):
 
     """
 
+    # The Comp of the Flow when returned by `Comp.flow()`
+    __slots__ = ('_comp',)
+
     def set_pos(self, tool, pos):
         """Reposition the given Tool to the position in the FlowView.
 
@@ -1187,6 +2582,74 @@ class Flow(PyObject):
 
         return self._reference.GetPos(tool._reference)
 
+    def get_positions(self, tools=None, as_array=False):
+        """Return the X and Y position of many tools in the FlowView.
+
+        Instead of a call per tool the positions are read from the settings
+        table of all tools at once, see `Comp.copy_settings()`. Only tools
+        of which the position isn't in the settings are looked up one by one.
+
+        Example
+            >>> c = Comp()
+            >>> positions = c.flow().get_positions()
+            >>> names, array = c.flow().get_positions(as_array=True)
+            >>> print array.mean(axis=0)
+
+        Args:
+            tools (list or None): The tools to return the position of. When
+                None all tools in the composition are used.
+            as_array (bool): Return the names and the positions separately,
+                with the positions as an array.
+
+        Returns:
+            dict or tuple: The [x, y] position by tool name, in the order of
+                the tools. With `as_array` the tool names and their
+                positions, as a NumPy array of shape (N, 2) when NumPy is
+                available.
+
+        Raises:
+            ValueError: When no tools are given and the composition of this
+                Flow isn't known, eg. when not retrieved with `Comp.flow()`.
+
+        """
+        comp = getattr(self, '_comp', None)
+        if tools is None:
+            if comp is None:
+                raise ValueError("The composition of this Flow is unknown, "
+                                 "use Comp.flow() or pass the tools")
+            tools = comp.get_tool_list()
+        else:
+            tools = list(tools)
+            if comp is None and tools:
+                comp = tools[0].comp()
+
+        # The settings also contain eg. the splines of animated Inputs
+        settings = comp.copy_settings(tools) if tools else None
+        tools_settings = (settings or {}).get('Tools') or {}
+
+        positions = OrderedDict()
+        for tool in tools:
+            name = tool.name()
+            tool_settings = tools_settings.get(name)
+            pos = None
+            if isinstance(tool_settings, dict):
+                pos = (tool_settings.get('ViewInfo') or {}).get('Pos')
+            if pos:
+                positions[name] = [pos[1.0] / FLOW_GRID[0],
+                                   pos[2.0] / FLOW_GRID[1]]
+            else:
+                pos = self._reference.GetPosTable(tool._reference)
+                positions[name] = [pos[1.0], pos[2.0]]
+
+        if not as_array:
+            return positions
+
+        names = list(positions)
+        values = list(positions.values())
+        if numpy is not None:
+            values = numpy.asarray(values, dtype=float).reshape(-1, 2)
+        return names, values
+
     def queue_set_pos(self, tool, pos):
         """ Queues the moving of a tool to a new position.
 
@@ -1203,7 +2666,11 @@ class Flow(PyObject):
             >>> for i, tool in enumerate(tools):
             >>>     pos = [i, 0]
             >>>     flow.queue_set_pos(tool, pos)
-            >>> flow.flush_set_pos()    # here the tools are actually moved
+            >>> flow.flush_set_pos_queue()    # here the tools are moved
+
+        .. note::
+            Within `Comp.layout()` this is used by `Tool.set_pos()`.
+
         """
         return self._reference.QueueSetPos(tool._reference, pos[0], pos[1])
 
@@ -1284,9 +2751,72 @@ class Flow(PyObject):
 class Link(PyObject):
     """The Link is the base class for Fusion's Input and Output types"""
 
+    __slots__ = ()
+
     def tool(self):
         """ Return the Tool this Link belongs to """
-        return Tool(self._reference.GetTool())
+        tool = getattr(self, '_tool', None)
+        if tool is None:
+            tool = Tool(self._reference.GetTool())
+        return tool
+
+    def _current_time(self):
+        """Return the time to use when no time is provided.
+
+        This is the time set with `Comp.at_time()` for the current thread,
+        otherwise the current time of the comp.
+
+        """
+        time = getattr(_evaluation, 'time', None)
+        if time is None:
+            # optimize over going through PyNodes (??)
+            # instead of: time = self.tool().comp().get_current_time()
+            time = self._reference.GetTool().Composition.CurrentTime
+        return time
+
+    def _render_range(self):
+        """Return the frames in the render range of this Link's comp."""
+        attrs = self._reference.GetTool().Composition.GetAttrs()
+        return range(int(attrs['COMPN_RenderStart']),
+                     int(attrs['COMPN_RenderEnd']) + 1)
+
+    def _sample(self, get, times, threads=None):
+        """Return `get(time)` for each time, as an array when possible.
+
+        Args:
+            get (callable): Returns the value for a single time.
+            times (list or None): The times to sample. When None all frames
+                in the comp's render range are sampled.
+            threads (int or None): When provided the times are sampled by
+                this amount of threads concurrently. Only use this when the
+                connection to Fusion allows concurrent calls.
+
+        Returns:
+            numpy.ndarray or list: The value for each time. When NumPy is
+                available and all values are numbers an array is returned.
+
+        """
+        if times is None:
+            times = self._render_range()
+        times = list(times)
+
+        if threads:
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(threads)
+            try:
+                values = pool.map(get, times)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            values = [get(time) for time in times]
+
+        if numpy is not None and all(
+                isinstance(value, (int, float)) and
+                not isinstance(value, bool) for value in values):
+            return numpy.asarray(values, dtype=float)
+
+        return values
 
 
 class Input(Link):
@@ -1303,10 +2833,30 @@ class Input(Link):
 
     """
 
-    def __current_time(self):
-        # optimize over going through PyNodes (??)
-        # instead of: time = self.tool().comp().get_current_time()
-        return self._reference.GetTool().Composition.CurrentTime
+    # The Tool is kept when the Input is looked up from it, see `tool()`
+    __slots__ = ('_schema_key', '_tool')
+
+    def schema(self):
+        """Return the data type and enum tables of this Input.
+
+        The schema is shared by the Inputs with the same ID on all tools of
+        the same type, see `InputSchemaCache`. Looking up the tool of an
+        Input costs more calls than fetching its attributes, so the schema
+        of an Input of which the tool isn't known, eg. not retrieved with
+        `Tool.input()`, is built from its attributes directly instead.
+
+        Returns:
+            InputSchema: The schema of this Input.
+
+        """
+        key = getattr(self, '_schema_key', None)
+        if key is None:
+            tool = getattr(self, '_tool', None)
+            if tool is None:
+                return InputSchema(self.get_attrs())
+            key = (tool.reg_id(), self._reference.ID)
+            self._schema_key = key
+        return input_schemas.get(key, self)
 
     def get_value(self, time=None):
         """Get the value of this Input at the given time.
@@ -1320,10 +2870,35 @@ class Input(Link):
 
         """
         if time is None:
-            time = self.__current_time()
+            time = self._current_time()
 
         return self._reference[time]
 
+    def get_values(self, times=None, threads=None):
+        """Get the values of this Input at many times.
+
+        Example
+            >>> values = tool.input("Size").get_values(range(1001, 1101))
+
+        Arguments:
+            times (list or None): The times to get the values at. When None
+                all frames in the comp's render range are used.
+            threads (int or None): When provided the values are retrieved by
+                this amount of threads concurrently. Only use this when the
+                connection to Fusion allows concurrent calls.
+
+        Returns:
+            numpy.ndarray or list: The value at each time. A NumPy array is
+                returned when NumPy is available and all values are numbers.
+
+        """
+        reference = self._reference
+
+        def get(time):
+            return reference[time]
+
+        return self._sample(get, times, threads=threads)
+
     def set_value(self, value, time=None):
         """Set the value of the input at the given time.
 
@@ -1341,52 +2916,23 @@ class Input(Link):
                 currentt time is used.
 
         """
+        batch = getattr(_batching, 'batch', None)
+        if batch is not None:
+            batch.set_value(self, value, time)
+            return
 
         if time is None:
-            time = self.__current_time()
-
-        attrs = self.get_attrs()
-        data_type = attrs['INPS_DataType']
-
-        # Setting boolean values doesn't work. So instead set an integer value
-        # allow settings checkboxes with True/False
-        if isinstance(value, bool):
-            value = int(value)
-
-        # Convert float/integer to enum if datatype == "FuID"
-        elif isinstance(value, (int, float)) and data_type == "FuID":
+            time = self._current_time()
 
-            # We must compare it with a float value. We add 1 to interpret
-            # as zero based indices. (Zero would be 1.0 in the fusion id
-            # dictionary, etc.)
-            v = float(value) + 1.0
-
-            enum_keys = ("INPIDT_MultiButtonControl_ID",
-                         "INPIDT_ComboControl_ID")
-            for enum_key in enum_keys:
-                if enum_key in attrs:
-                    enum = attrs[enum_key]
-                    if v in enum:
-                        value = enum[v]
-                        break
+        self._reference[time] = self._convert_value(value)
 
-        # Convert enum string value to its corresponding integer value
-        elif (isinstance(value, basestring) and
-                data_type != "Text" and
-                data_type != "FuID"):
+    def _convert_value(self, value):
+        """Return `value` converted to the data type of this Input.
 
-            enum_keys = ("INPST_MultiButtonControl_String",
-                         "INPIDT_MultiButtonControl_ID",
-                         "INPIDT_ComboControl_ID")
-            for enum_key in enum_keys:
-                if enum_key in attrs:
-                    enum = dict((str(key), value) for value, key in
-                                attrs[enum_key].items())
-                    if value in enum:
-                        value = enum[str(value)] - 1.0
-                        break
+        See `set_value()` for the conversions.
 
-        self._reference[time] = value
+        """
+        return self.schema().convert(value)
 
     def connect_to(self, output):
         """Connect an Output as incoming connection to this Input.
@@ -1407,15 +2953,20 @@ class Input(Link):
 
         """
 
+        if output is not None and not isinstance(output, Output):
+            output = Output(output)
+
+        batch = getattr(_batching, 'batch', None)
+        if batch is not None:
+            batch.connect(self, output)
+            return
+
         # disconnect
         if output is None:
             self._reference.ConnectTo(None)
             return
 
         # or connect
-        if not isinstance(output, Output):
-            output = Output(output)
-
         self._reference.ConnectTo(output._reference)
 
     def disconnect(self):
@@ -1452,6 +3003,121 @@ class Input(Link):
         """
         self._reference.SetExpression(expression)
 
+    def set_values(self, times, values, interpolation="smooth",
+                   replace=False):
+        """Set keyframes for many times at once.
+
+        Instead of setting each key separately the BezierSpline animating
+        this Input gets all keys applied with a single `LoadSettings` call.
+        If the Input isn't connected yet a BezierSpline is connected to it.
+
+        This only supports Inputs with numeric values.
+
+        Example
+            >>> blur = Comp().create_tool("Blur")
+            >>> blur.input("XBlurSize").set_values(range(100),
+            >>>                                    [x * 0.1 for x in range(100)],
+            >>>                                    interpolation="linear")
+
+        Args:
+            times (list): The times to set a key at. Any sequence of numbers
+                is supported, eg. a NumPy array.
+            values (list): The value for each time.
+            interpolation (str): The interpolation between the keys, either
+                "smooth", "linear" or "step".
+            replace (bool): When True existing keys are removed, otherwise
+                the new keys are merged with them (replacing keys at the same
+                time).
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: When the amount of times and values differ or the
+                Input is connected to an Output other than a BezierSpline.
+
+        """
+        times = [float(x) for x in times]
+        values = [float(x) for x in values]
+        if len(times) != len(values):
+            raise ValueError("Amount of times and values differ: "
+                             "{0} != {1}".format(len(times), len(values)))
+
+        spline = self._get_spline()
+        if spline is None:
+            if self._reference.GetConnectedOutput():
+                # Don't replace the connection, eg. to another tool
+                raise ValueError("Input is connected to an Output that isn't "
+                                 "a BezierSpline: {0}".format(self))
+            spline = self._create_spline()
+
+        settings, spline_settings = self._spline_settings(spline)
+
+        keys = dict(zip(times, values))
+        if not replace:
+            existing = spline_settings.get('KeyFrames') or {}
+            for time, key in existing.items():
+                keys.setdefault(float(time), key[1])
+
+        keyframes = bezier_keyframes(sorted(keys.items()),
+                                     interpolation=interpolation)
+        if not replace:
+            # Keep the handles and flags of the keys that weren't changed.
+            # The keys next to a changed key only keep their flags, their
+            # handles need to point towards the new neighbour.
+            changed = set(times)
+            order = sorted(keyframes)
+            neighbours = set()
+            for i, time in enumerate(order):
+                if time in changed:
+                    neighbours.update(order[max(0, i - 1):i + 2])
+
+            for time, key in existing.items():
+                time = float(time)
+                if time in changed:
+                    continue
+                if time in neighbours:
+                    key = dict(key)
+                    for handle in ('LH', 'RH'):
+                        key.pop(handle, None)
+                        if handle in keyframes[time]:
+                            key[handle] = keyframes[time][handle]
+                keyframes[time] = key
+
+        spline_settings['KeyFrames'] = keyframes
+        spline.load_settings(settings)
+
+    def _get_spline(self):
+        """Return the BezierSpline Tool animating this Input, if any."""
+        output = self._reference.GetConnectedOutput()
+        if output:
+            tool = Tool(output.GetTool())
+            if tool.reg_id() == "BezierSpline":
+                return tool
+
+    def _spline_settings(self, spline):
+        """Return the saved settings of a spline and the spline's own table.
+
+        Returns:
+            tuple: The settings table, to load after changing it, and the
+                settings of the spline within its `Tools` table.
+
+        """
+        settings = spline.save_settings()
+        tools = settings.get('Tools') or {}
+        # Skip the "__flags" of an `ordered()` table
+        entries = [value for value in tools.values() if isinstance(value, dict)]
+        if len(entries) == 1:
+            return settings, entries[0]
+        return settings, tools[spline.name()]
+
+    def _create_spline(self):
+        """Animate this Input with a new BezierSpline and return it."""
+        comp = self._reference.GetTool().Composition
+        spline = comp.BezierSpline({})
+        self._reference.ConnectTo(spline.FindMainOutput(1))
+        return Tool(spline)
+
     def get_keyframes(self):
         """Return the times at which this Input has keys.
 
@@ -1467,9 +3133,95 @@ class Input(Link):
     def remove_keyframes(self, time=None, index=None):
         """Remove the keyframes on this Input (if any)
 
+        The keys to remove are selected by time or by index. When neither is
+        provided all keys are removed. The remaining keys are applied to the
+        BezierSpline animating this Input with a single `LoadSettings` call.
+        When no keys remain the BezierSpline is disconnected and the Input
+        keeps its current value.
+
+        Example
+            >>> input.remove_keyframes(time=(1001, 1050))   # range
+            >>> input.remove_keyframes(time=[1060, 1070])   # specific times
+            >>> input.remove_keyframes(index=[0, -1])       # first and last
+            >>> input.remove_keyframes()                    # all keys
+
+        Args:
+            time (float, tuple or list): A single time, a (start, end) tuple
+                for an inclusive range of times or a list of times.
+            index (int or list): Index or list of indices of the keys, in
+                order of time. Negative indices count from the last key.
+
+        Returns:
+            int: The amount of removed keys.
+
         """
-        # TODO: Implement Input.remove_keyframes()
-        raise NotImplementedError()
+        spline = self._get_spline()
+        if spline is None:
+            return 0
+
+        settings, spline_settings = self._spline_settings(spline)
+        keyframes = spline_settings.get('KeyFrames') or {}
+        times = sorted(keyframes, key=float)
+
+        if time is None and index is None:
+            remove = set(times)
+        else:
+            remove = set()
+            if isinstance(time, tuple) and len(time) == 2:
+                start, end = time
+                remove.update(x for x in times if start <= x <= end)
+            elif time is not None and (not hasattr(time, '__iter__') or
+                                       isinstance(time, basestring)):
+                remove.update(x for x in times if float(x) == float(time))
+            elif time is not None:
+                selected = set(float(x) for x in time)
+                remove.update(x for x in times if float(x) in selected)
+
+            if index is not None:
+                indices = index if isinstance(index, (list, tuple)) else [index]
+                for i in indices:
+                    try:
+                        remove.add(times[i])
+                    except IndexError:
+                        pass
+
+        if not remove:
+            return 0
+
+        if len(remove) == len(times):
+            # Without keys the Input isn't animated anymore, so disconnect
+            # the BezierSpline and keep the current value
+            value = self.get_value()
+            self._reference.ConnectTo(None)
+            self._reference[self._current_time()] = value
+            return len(remove)
+
+        # The handles of the keys next to removed keys point towards keys
+        # that no longer exist, so those keys get new handles.
+        neighbours = set()
+        for i, key_time in enumerate(times):
+            if key_time in remove:
+                neighbours.update(times[max(0, i - 1):i + 2])
+        neighbours -= remove
+
+        remaining = [x for x in times if x not in remove]
+
+        points = [(float(x), keyframes[x][1]) for x in remaining]
+        computed = bezier_keyframes(points)
+        result = dict()
+        for key_time in remaining:
+            key = keyframes[key_time]
+            if key_time in neighbours:
+                key = dict(key)
+                for handle in ('LH', 'RH'):
+                    key.pop(handle, None)
+                    if handle in computed[float(key_time)]:
+                        key[handle] = computed[float(key_time)][handle]
+            result[key_time] = key
+
+        spline_settings['KeyFrames'] = result
+        spline.load_settings(settings)
+        return len(remove)
 
     def is_connected(self):
         """Return whether the Input is an incoming connection from an Output
@@ -1489,7 +3241,7 @@ class Input(Link):
             str: Type of parameter.
 
         """
-        return self._reference.GetAttrs()['OUTS_DataType']
+        return self.get_attr('INPS_DataType')
 
     # TODO: implement `Input.WindowControlsVisible`
     # TODO: implement `Input.HideWindowControls`
@@ -1507,6 +3259,8 @@ class Output(Link):
 
     """
 
+    __slots__ = ()
+
     def get_value(self, time=None):
         """Return the value of this Output at the given time.
 
@@ -1523,6 +3277,116 @@ class Output(Link):
         """
         return self.get_value_attrs(time=time)[0]
 
+    def get_values(self, times=None, threads=None):
+        """Return the values of this Output at many times.
+
+        .. note:: This will evaluate the output at each time and could be
+            computationally expensive.
+
+        Example
+            >>> output = tool.main_output(1)
+            >>> costs = output.get_values(range(1001, 1101))
+
+        Args:
+            times (list or None): Times at which to evaluate the Output.
+                When None all frames in the comp's render range are used.
+            threads (int or None): When provided the Output is evaluated by
+                this amount of threads concurrently. Only use this when the
+                connection to Fusion allows concurrent calls.
+
+        Returns:
+            numpy.ndarray or list: The value at each time. A NumPy array is
+                returned when NumPy is available and all values are numbers.
+
+        """
+        get_value = self._reference.GetValue
+
+        def get(time):
+            return get_value(time)[0]
+
+        return self._sample(get, times, threads=threads)
+
+    def iter_values(self, start, end, step=1, prefetch=2):
+        """Yield the value and attrs of this Output over a range of frames.
+
+        While the caller processes a frame the next frames are evaluated
+        in a worker thread, keeping up to `prefetch` evaluated frames ready.
+        Values are yielded in order of time. When the consumer stops early
+        (eg. breaks out of the loop) the worker stops after the evaluation
+        that is in progress.
+
+        .. note:: The worker thread calls into Fusion concurrently with the
+            caller. Use a `prefetch` of 0 to evaluate in the calling thread
+            when the connection to Fusion doesn't allow that.
+
+        Example
+            >>> output = Comp().get_active_tool().main_output(1)
+            >>> for time, value, attrs in output.iter_values(1001, 1100):
+            >>>     print time, attrs['TimeCost']
+
+        Args:
+            start (float): The first time to evaluate.
+            end (float): The last time to evaluate (inclusive).
+            step (float): The step between the times.
+            prefetch (int): The amount of frames to evaluate ahead.
+
+        Yields:
+            tuple: The (time, value, attrs) for each time.
+
+        """
+        if step <= 0:
+            raise ValueError("Step must be positive: {0}".format(step))
+
+        count = int((end - start) / step) + 1 if end >= start else 0
+        times = [start + i * step for i in range(count)]
+        get_value = self._reference.GetValue
+
+        if not prefetch:
+            for time in times:
+                value, attrs = get_value(time)
+                yield time, value, attrs
+            return
+
+        results = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # Wait for room in the queue, unless the consumer stopped
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def evaluate():
+            try:
+                for time in times:
+                    if stop.is_set():
+                        return
+                    put((time, get_value(time), None))
+            except Exception as exc:
+                put((None, None, exc))
+            finally:
+                put(done)
+
+        worker = threading.Thread(target=evaluate)
+        worker.daemon = True
+        worker.start()
+        try:
+            while True:
+                item = results.get()
+                if item is done:
+                    break
+                time, result, error = item
+                if error is not None:
+                    raise error
+                yield time, result[0], result[1]
+        finally:
+            stop.set()
+            worker.join()
+
     def get_value_attrs(self, time=None):
         """Returns a tuple of value and attrs for this Output.
 
@@ -1549,9 +3413,7 @@ class Output(Link):
 
         """
         if time is None:
-            # optimize over going through PyNodes (??)
-            time = self._reference.GetTool().Composition.CurrentTime
-            # time = self.tool().comp().get_current_time()
+            time = self._current_time()
 
         return self._reference.GetValue(time)
 
@@ -1605,6 +3467,59 @@ class Output(Link):
         """
         return [Input(x) for x in self._reference.GetConnectedInputs().values()]
 
+    def get_image(self, time=None):
+        """Return the Image value of this Output at the given time.
+
+        Unlike `get_value()` this returns the value as an `Image` that is
+        able to access its pixels through `Image.as_array()`.
+
+        Args:
+            time (float): Time at which to evaluate the Output.
+                If None provided current time will be used.
+
+        Returns:
+            Image or None: The image at the given time, None if the Output
+                has no value.
+
+        """
+        if time is None:
+            time = self._current_time()
+
+        value = self.get_value(time)
+        if value is None:
+            return None
+
+        image = Image(value)
+        image._source = (self, time)
+        return image
+
+    def get_value_mem_block(self, time=None):
+        """Return the value of this Output as a MemBlock buffer.
+
+        The buffer is exposed as a `memoryview` on the MemBlock returned by
+        Fusion, so no copy of the data is made.
+
+        .. note:: This will evaluate the output and could be computationally
+            expensive.
+
+        Args:
+            time (float): Time at which to evaluate the Output.
+                If None provided current time will be used.
+
+        Returns:
+            memoryview: The raw data of the Output's value.
+
+        """
+        if time is None:
+            time = self._current_time()
+
+        block = self._reference.GetValueMemBlock(time)
+        try:
+            return memoryview(block)
+        except TypeError:
+            raise TypeError("MemBlock of {0} doesn't support the buffer "
+                            "protocol: {1}".format(self, block))
+
     def get_dod(self):
         """Returns the Domain of Definition for this output.
 
@@ -1655,17 +3570,68 @@ class Output(Link):
             str: Type of parameter.
 
         """
-        return self._reference.GetAttrs()['INPS_DataType']
+        return self.get_attr('OUTS_DataType')
+
+    def enable_disk_cache(self, enable=True, path=None, lock_cache=False,
+                          lock_branch=False, delete=False, pre_render=True,
+                          use_network=False):
+        """Enable or disable caching this Output to disk.
+
+        Cached frames are read from disk instead of rendering the branch of
+        tools up to this Output. For managing the caches of a whole comp
+        see `fusionless.diskcache.DiskCacheManager`.
+
+        Args:
+            enable (bool): Whether to enable or disable the disk cache.
+            path (str or None): The path of the cache files. When None
+                Fusion's default settings are used for all other arguments.
+            lock_cache (bool): Lock the cache so it's not cleared when the
+                upstream tools change.
+            lock_branch (bool): Lock the upstream tools so they aren't
+                rendered at all.
+            delete (bool): When disabling, delete the cache files.
+            pre_render (bool): Render the cache right away.
+            use_network (bool): Render the cache using network rendering.
+
+        Returns:
+            bool: Whether the call succeeded.
+
+        """
+        args = [enable]
+        if path is not None:
+            args.extend([path, lock_cache, lock_branch, delete, pre_render,
+                         use_network])
+        return self._reference.EnableDiskCache(*args)
+
+    def clear_disk_cache(self, start=None, end=None):
+        """Clear frames from the disk cache of this Output.
+
+        Args:
+            start (int or None): First frame to clear. When None and no
+                `end` is given all frames are cleared, otherwise the frames
+                from the start of the comp's global range are cleared.
+            end (int or None): Last frame to clear. When None only the start
+                frame is cleared.
+
+        Returns:
+            bool: Whether the call succeeded.
+
+        """
+        if start is None and end is not None:
+            attrs = self._reference.GetTool().Composition.GetAttrs()
+            start = int(attrs['COMPN_GlobalStart'])
+
+        args = [x for x in (start, end) if x is not None]
+        return self._reference.ClearDiskCache(*args)
 
-    # TODO: implement `Output.GetValueMemBlock`	    Retrieve the Output's value as a MemBlock
-    # TODO: implement `Output.EnableDiskCache`      Controls disk-based caching
-    # TODO: implement `Output.ClearDiskCache`       Clears frames from the disk cache
-    # TODO: implement `Output.ShowDiskCacheDlg`     Displays the Cache-To-Disk dialog for user interaction
+    def show_disk_cache_dlg(self):
+        """Show the Cache-To-Disk dialog of this Output to the user."""
+        return self._reference.ShowDiskCacheDlg()
 
 
 class Parameter(PyObject):
     """ Base class for all parameter (values) types """
-    pass
+    __slots__ = ()
 
 
 class Image(Parameter):
@@ -1673,6 +3639,106 @@ class Image(Parameter):
 
     For example the Image output from a Tool.
     """
+    # The (Output, time) the image was retrieved from, see `Output.get_image`
+    # and the MemBlock of its pixels once retrieved, see `as_array()`
+    __slots__ = ('_source', '_block')
+
+    # Image depth indicator to (struct format, NumPy dtype) of its channels
+    DEPTH_FORMATS = {
+        1: ('B', 'uint8'),
+        2: ('H', 'uint16'),
+        3: ('e', 'float16'),
+        4: ('f', 'float32')
+    }
+    CHANNELS = 4    # RGBA
+
+    def dtype(self):
+        """Return the NumPy dtype name of the channels of this image.
+
+        Returns:
+            str: The dtype name, eg. "float32"
+
+        """
+        return self._format()[1]
+
+    def as_array(self):
+        """Return the pixels of this image without copying them.
+
+        The pixels are read from the MemBlock of the Output the image was
+        retrieved from, see `Output.get_image()`. Rows are ordered bottom to
+        top like Fusion stores them.
+
+        .. note::
+            Fusion's image value doesn't expose its pixels, so the first call
+            retrieves the MemBlock of the Output at the same time, which
+            evaluates the Output again unless Fusion still has the frame
+            cached. The MemBlock is kept for later calls.
+
+        With NumPy available an array of shape (height, width, channels) is
+        returned with the dtype matching the image's depth. Otherwise a
+        `memoryview` cast to the same shape is returned, except for float16
+        images of which the raw bytes are returned per pixel since a
+        memoryview can't represent half floats. Python 2 memoryviews can't be
+        cast, so there a flat memoryview of the bytes is returned without
+        NumPy.
+
+        Example
+            >>> image = tool.main_output(1).get_image(1001)
+            >>> pixels = image.as_array()
+            >>> print pixels[..., 3].mean()     # average alpha
+
+        Returns:
+            numpy.ndarray or memoryview: The pixels of the image.
+
+        """
+        source = getattr(self, '_source', None)
+        if source is None:
+            raise ValueError("{0} has no Output to read its pixels from, "
+                             "use Output.get_image()".format(self))
+        data = getattr(self, '_block', None)
+        if data is None:
+            output, time = source
+            data = output.get_value_mem_block(time)
+            self._block = data
+
+        fmt, dtype = self._format()
+        width = int(self.width())
+        height = int(self.height())
+
+        if numpy is not None:
+            array = numpy.frombuffer(data, dtype=dtype)
+            return array.reshape(height, width, -1)
+
+        if not hasattr(data, 'cast'):
+            # Python 2 memoryviews can't be cast, return the flat bytes
+            return data
+
+        if fmt == 'e':
+            # Half floats can't be cast to, so keep the raw bytes per row
+            fmt = 'B'
+
+        channels = data.nbytes // (width * height * struct.calcsize(fmt))
+        return data.cast('B').cast(fmt, shape=[height, width, channels])
+
+    def nbytes(self):
+        """Return the size of the pixels of this image in bytes.
+
+        Returns:
+            int: Size of the pixels in bytes.
+
+        """
+        fmt = self._format()[0]
+        return (int(self.width()) * int(self.height()) * self.CHANNELS *
+                struct.calcsize(fmt))
+
+    def _format(self):
+        """Return the (struct format, NumPy dtype) for the image's depth."""
+        depth = int(self.depth())
+        try:
+            return self.DEPTH_FORMATS[depth]
+        except KeyError:
+            raise ValueError("Unsupported image depth: {0}".format(depth))
+
     def width(self):
         """ Return the width in pixels for the current output, this could be for the current proxy resolution.
         :return: Actual horizontal size, in pixels
@@ -1749,7 +3815,7 @@ class Image(Parameter):
 
 
 class TransformMatrix(Parameter):
-    pass
+    __slots__ = ()
 
 
 class Fusion(PyObject):
@@ -1759,6 +3825,8 @@ class Fusion(PyObject):
     For example this would allow you to retrieve the available compositions
     that are currently open or open a new one.
     """
+    __slots__ = ()
+
     # TODO: Implement Fusion methods: http://www.steakunderwater.com/VFXPedia/96.0.243.189/index5522.html?title=Eyeon:Script/Reference/Applications/Fusion/Classes/Fusion
 
     @staticmethod
@@ -1958,4 +4026,18 @@ class AskUserDialog(object):
 
 class Registry(PyObject):
     """Represents a Registry type of object within Fusion"""
-    pass
+    __slots__ = ()
+
+
+type_cache = TypeCache()
+identity_map = IdentityMap()
+attrs_cache = AttrsCache()
+input_schemas = InputSchemaCache()
+type_cache.register(Comp, type_name="Composition", attr_prefix="COMP")
+type_cache.register(Tool, type_name="Tool", attr_prefix="TOOL")
+type_cache.register(Input, type_name="Input", attr_prefix="INP")
+type_cache.register(Output, type_name="Output", attr_prefix="OUT")
+type_cache.register(Flow, type_name="FlowView", attr_prefix="VIEW")
+type_cache.register(Fusion, type_name="Fusion", attr_prefix="FUSION")
+# Image (output value) does not return attributes from GetAttrs()
+type_cache.register(Image, type_name="Image", transient=True)
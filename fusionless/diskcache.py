@@ -0,0 +1,356 @@
+"""Cost-driven management of the disk caches of a composition.
+
+Caching an Output to disk saves rendering the branch of tools up to it, but
+disk space is limited and a cache needs to be rebuilt whenever anything
+upstream changes. The `DiskCacheManager` profiles the render cost of the
+tools, picks the most expensive branches that rarely change within a disk
+budget and keeps track of which caches became stale.
+
+    Example
+        >>> import fusionless as fu
+        >>> from fusionless.diskcache import DiskCacheManager
+        >>> manager = DiskCacheManager(fu.Comp(),
+        >>>                            budget=50 * 1024 ** 3,   # 50 GB
+        >>>                            path="D:/cache")
+        >>> manager.profile()
+        >>> manager.apply(manager.select())
+        >>> # ... after changes to the comp
+        >>> print manager.stale()
+        >>> manager.refresh()
+
+"""
+
+import os
+import hashlib
+
+from .settings import settings_hash
+
+
+def fingerprint(tools):
+    """Return a hash of the settings of the given tools.
+
+    The position of the tools in the Flow is ignored, so only changes that
+    affect their result change the fingerprint.
+
+    Args:
+        tools (list): The Tools to fingerprint.
+
+    Returns:
+        str: The hexadecimal digest of the tools' settings.
+
+    """
+    return _combine(_tool_hash(tool) for tool in tools)
+
+
+def _tool_hash(tool):
+    """Return the hash of the settings of a single tool."""
+    return settings_hash(tool.save_settings(), ignore=('ViewInfo',))
+
+
+def _combine(hashes):
+    """Return a single hash of the hashes of many tools, in any order."""
+    digest = hashlib.md5()
+    for value in sorted(hashes):
+        digest.update(value.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CacheCandidate(object):
+    """The measured costs of caching the main Output of a Tool to disk.
+
+    Attributes:
+        tool (Tool): The tool of which the main Output can be cached.
+        output (Output): The Output to cache.
+        cost (float): Mean seconds to render a frame of the Output. This
+            includes rendering the tools upstream of it, which is what's
+            saved when it's cached.
+        frame_bytes (int): Estimated disk size of a single cached frame.
+        frames (int): The amount of frames to cache.
+        upstream (set): Names of all tools upstream of the tool, including
+            tools that aren't candidates themselves.
+        fingerprint (str): Hash of the settings of the tool and its
+            upstream tools when profiled.
+        changes (int): How often the fingerprint changed between profiles.
+        cached_fingerprint (str or None): The fingerprint when the cache was
+            enabled, None if not cached by the manager.
+
+    """
+
+    def __init__(self, tool, output, cost, frame_bytes, frames):
+        self.tool = tool
+        self.output = output
+        self.cost = cost
+        self.frame_bytes = frame_bytes
+        self.frames = frames
+        self.upstream = set()
+        self.fingerprint = None
+        self.changes = 0
+        self.cached_fingerprint = None
+
+    @property
+    def name(self):
+        return self.tool.name()
+
+    @property
+    def size(self):
+        """Estimated disk size of the full cache in bytes"""
+        return self.frame_bytes * self.frames
+
+    @property
+    def savings(self):
+        """Seconds saved per render of all frames when cached"""
+        return self.cost * self.frames
+
+    @property
+    def score(self):
+        """Seconds saved per byte of disk space"""
+        if not self.size:
+            return 0.0
+        return self.savings / float(self.size)
+
+    def __repr__(self):
+        return '{0}("{1}", savings={2:.2f}s, size={3})'.format(
+            self.__class__.__name__, self.name, self.savings, self.size)
+
+
+class DiskCacheManager(object):
+    """Select which Outputs of a comp to cache to disk based on cost.
+
+    Args:
+        comp (Comp): The composition to manage the caches of.
+        budget (int): The amount of disk space available in bytes.
+        path (str): The directory to store the caches in.
+        sample_times (list or None): The frames at which the cost of each
+            tool is measured. When None the first, middle and last frame of
+            the comp's render range are used.
+        max_changes (int): Branches that changed more often than this
+            between profiles are not selected to be cached.
+
+    """
+
+    def __init__(self, comp, budget, path, sample_times=None, max_changes=0):
+        self.comp = comp
+        self.budget = budget
+        self.path = path
+        self.sample_times = sample_times
+        self.max_changes = max_changes
+
+        # Candidates and cached candidates by tool name
+        self.candidates = dict()
+        self.cached = dict()
+
+        # All tools in the branches of the candidates by name
+        self.tools = dict()
+
+    def _render_range(self):
+        attrs = self.comp.get_attrs(['COMPN_RenderStart', 'COMPN_RenderEnd'])
+        return int(attrs['COMPN_RenderStart']), int(attrs['COMPN_RenderEnd'])
+
+    def profile(self, tools=None):
+        """Measure the cost and cache size of the main Output of the tools.
+
+        Each profile also compares the fingerprint of each branch with the
+        previous profile to count how often the branch changes.
+
+        Args:
+            tools (list or None): The tools to profile. When None all tools
+                in the comp are profiled. Only tools that output an image are
+                considered.
+
+        Returns:
+            list: The `CacheCandidate` for each tool, best candidates first.
+
+        """
+        if tools is None:
+            tools = self.comp.get_tool_list()
+
+        start, end = self._render_range()
+        frames = end - start + 1
+        times = self.sample_times
+        if times is None:
+            times = sorted(set([start, (start + end) // 2, end]))
+
+        candidates = dict()
+        with self.comp.cached_attrs():
+            for tool in tools:
+                reference = tool._reference.FindMainOutput(1)
+                if not reference:
+                    continue
+                output = tool.main_output(1)
+                if output.data_type() != "Image":
+                    continue
+
+                image = output.get_image(times[0])
+                if image is None:
+                    continue
+
+                cost = sum(output.get_time_cost(time) for time in times)
+                cost /= float(len(times))
+                candidate = CacheCandidate(tool, output, cost,
+                                           frame_bytes=image.nbytes(),
+                                           frames=frames)
+                candidates[tool.name()] = candidate
+
+            # The connections and settings of each tool are only queried
+            # once, even when it's upstream of many candidates
+            sources, branch_tools = self._walk(
+                [candidate.tool for candidate in candidates.values()])
+            hashes = dict((name, _tool_hash(tool))
+                          for name, tool in branch_tools.items())
+            self.tools.update(branch_tools)
+
+            for name, candidate in candidates.items():
+                candidate.upstream = self._upstream(name, sources)
+                candidate.fingerprint = _combine(
+                    hashes[other] for other in
+                    [name] + list(candidate.upstream))
+
+                previous = self.candidates.get(name)
+                if previous is not None:
+                    candidate.changes = previous.changes
+                    if previous.fingerprint != candidate.fingerprint:
+                        candidate.changes += 1
+                    candidate.cached_fingerprint = previous.cached_fingerprint
+
+        self.candidates = candidates
+        for name in list(self.cached):
+            if name in candidates:
+                self.cached[name] = candidates[name]
+
+        return sorted(candidates.values(), key=lambda x: x.score,
+                      reverse=True)
+
+    @staticmethod
+    def _walk(tools):
+        """Return the connections of all tools upstream of `tools`.
+
+        Returns:
+            tuple: The names of the tools connected to the inputs of each
+                tool by name, and the Tools by name.
+
+        """
+        sources = dict()
+        found = dict()
+        stack = list(tools)
+        while stack:
+            tool = stack.pop()
+            name = tool.name()
+            if name in sources:
+                continue
+            found[name] = tool
+            sources[name] = set()
+            for output, _ in tool.connections(outputs=False):
+                source = output.tool()
+                sources[name].add(source.name())
+                stack.append(source)
+        return sources, found
+
+    @staticmethod
+    def _upstream(name, sources):
+        """Return the names of all tools upstream of `name`."""
+        upstream = set()
+        stack = list(sources.get(name, ()))
+        while stack:
+            other = stack.pop()
+            if other in upstream or other == name:
+                continue
+            upstream.add(other)
+            stack.extend(sources.get(other, ()))
+        return upstream
+
+    def select(self, candidates=None):
+        """Pick the candidates to cache within the disk budget.
+
+        Candidates are picked by the render time they save per byte of disk
+        space. Branches that changed more than `max_changes` times are
+        skipped, as are tools upstream of an already picked tool since its
+        cache already covers them.
+
+        Args:
+            candidates (list or None): The candidates to pick from. When None
+                the candidates of the last profile are used.
+
+        Returns:
+            list: The picked `CacheCandidate` instances.
+
+        """
+        if candidates is None:
+            candidates = self.candidates.values()
+
+        picked = []
+        used = 0
+        for candidate in sorted(candidates, key=lambda x: x.score,
+                                reverse=True):
+            if candidate.changes > self.max_changes:
+                continue
+            if candidate.savings <= 0:
+                continue
+            if used + candidate.size > self.budget:
+                continue
+            if any(candidate.name in other.upstream for other in picked):
+                continue
+
+            picked.append(candidate)
+            used += candidate.size
+
+        return picked
+
+    def apply(self, candidates, pre_render=True):
+        """Enable the disk caches of the candidates.
+
+        Caches previously enabled by this manager that are not in
+        `candidates` are disabled.
+
+        Args:
+            candidates (list): The candidates to cache.
+            pre_render (bool): Render the caches right away.
+
+        """
+        names = set(candidate.name for candidate in candidates)
+        for name, candidate in list(self.cached.items()):
+            if name not in names:
+                candidate.output.enable_disk_cache(False)
+                candidate.cached_fingerprint = None
+                del self.cached[name]
+
+        for candidate in candidates:
+            if candidate.name in self.cached:
+                continue
+            path = os.path.join(self.path, candidate.name)
+            candidate.output.enable_disk_cache(True, path=path,
+                                               pre_render=pre_render)
+            candidate.cached_fingerprint = candidate.fingerprint
+            self.cached[candidate.name] = candidate
+
+    def stale(self):
+        """Return the cached candidates of which the branch has changed.
+
+        Returns:
+            list: The stale `CacheCandidate` instances.
+
+        """
+        # Tools shared by the branches are only fingerprinted once
+        hashes = dict()
+        stale = []
+        for candidate in self.cached.values():
+            names = [candidate.name] + list(candidate.upstream)
+            for name in names:
+                if name not in hashes:
+                    hashes[name] = _tool_hash(self.tools[name])
+            candidate.fingerprint = _combine(hashes[name] for name in names)
+            if candidate.fingerprint != candidate.cached_fingerprint:
+                stale.append(candidate)
+        return stale
+
+    def refresh(self):
+        """Clear the stale caches so they get rebuilt.
+
+        Returns:
+            list: The refreshed `CacheCandidate` instances.
+
+        """
+        stale = self.stale()
+        for candidate in stale:
+            candidate.output.clear_disk_cache()
+            candidate.cached_fingerprint = candidate.fingerprint
+        return stale
@@ -0,0 +1,588 @@
+"""A read-only in-memory model of the node graph of a composition.
+
+Answering questions about the graph through the Tools themselves queries
+Fusion for every input, output and connection along the way. A
+`CompSnapshot` is built in one pass over the comp and answers those questions
+afterwards without any further calls to Fusion. The connections and positions
+of all tools are read from a single settings table.
+
+    Example
+        >>> import fusionless as fu
+        >>> snapshot = fu.Comp().snapshot()
+        >>> print snapshot.upstream("Merge1")
+        >>> for output, input in snapshot.connections("Merge1"):
+        >>>     print output, "->", input
+        >>> # ... after changes to the comp
+        >>> print snapshot.refresh()
+
+"""
+
+from array import array
+
+from .settings import (settings_hash, iter_connections, tools_by_name,
+                       FLOW_GRID)
+
+
+def _fingerprint(tool, changes, tool_settings=None):
+    """Return the fingerprint of a tool to detect changes with.
+
+    Args:
+        tool (Tool): The tool to fingerprint.
+        changes (str or None): "settings" to hash the full settings table of
+            the tool, "attrs" to hash its attributes or None to not detect
+            changes.
+        tool_settings (dict or None): The settings of the tool, as copied
+            for all tools at once. Used with "settings".
+
+    Returns:
+        str or None: The fingerprint.
+
+    """
+    if changes == "settings":
+        return settings_hash(tool_settings or {})
+    elif changes == "attrs":
+        return settings_hash(tool._reference.GetAttrs())
+    elif changes is None:
+        return None
+    raise ValueError("Invalid value for changes: {0}".format(changes))
+
+
+class ToolRecord(object):
+    """The state of a single tool in a `CompSnapshot`.
+
+    Attributes:
+        index (int): Index of the tool in the snapshot.
+        name (str): Name of the tool.
+        reg_id (str): Registry ID of the tool's type, eg. "Merge".
+        pos (tuple): The (x, y) position in the Flow.
+        inputs (array): Indices of the tool's inputs in the snapshot.
+        outputs (array): Indices of the tool's outputs in the snapshot.
+
+    """
+
+    __slots__ = ('index', 'name', 'reg_id', 'pos', 'inputs', 'outputs')
+
+    def __init__(self, index, name, reg_id, pos):
+        self.index = index
+        self.name = name
+        self.reg_id = reg_id
+        self.pos = pos
+        self.inputs = array('i')
+        self.outputs = array('i')
+
+    def __repr__(self):
+        return '{0}("{1}", "{2}")'.format(self.__class__.__name__,
+                                          self.name, self.reg_id)
+
+
+class CompSnapshot(object):
+    """Snapshot of the tools, inputs, outputs and connections of a comp.
+
+    Inputs and outputs are stored in flat arrays indexed by their index in
+    the snapshot. Each input stores the index of the output it's connected
+    to (or -1) and each tool stores the tools directly upstream and
+    downstream of it in arrays, so queries don't call Fusion.
+
+    Only connections between tools in the comp's tool list are stored, eg.
+    an Input animated by a BezierSpline is considered unconnected.
+
+    Use `CompSnapshot.build()` or `Comp.snapshot()` to create a snapshot and
+    `CompSnapshot.refresh()` to update it after changes to the comp.
+
+    """
+
+    def __init__(self):
+        self._comp = None
+        self._scope = None          # the names to include, None for all
+        self._changes = None
+
+        self._tools = []            # ToolRecord per tool index
+        self._by_name = dict()      # name -> tool index
+
+        # Per tool index: the Tool, its fingerprint or None when removed
+        self._objects = []
+        self._fingerprints = []
+
+        self._input_tool = array('i')
+        self._input_source = array('i')     # output index or -1
+        self._input_ids = []
+        self._input_types = []
+
+        self._output_tool = array('i')
+        self._output_ids = []
+        self._output_types = []
+
+        self._upstream = []         # array of tool indices per tool index
+        self._downstream = []       # array of tool indices per tool index
+
+        # Output data types by (registry ID, output ID)
+        self._output_type_cache = dict()
+
+    @classmethod
+    def build(cls, comp, tools=None, changes="settings"):
+        """Build a snapshot of a comp.
+
+        Args:
+            comp (Comp): The composition to snapshot.
+            tools (list or None): The tools to include. When None all tools
+                in the comp are included.
+            changes (str or None): How `refresh()` detects changed tools:
+                "settings" (default) hashes the settings table of each tool,
+                which includes its values, connections and position, copied
+                for all tools with a single call on each refresh. "attrs"
+                only hashes the attributes of each tool, eg. its name, which
+                is a call per tool. None only detects added and removed
+                tools. The fingerprints are computed while building.
+
+        Returns:
+            CompSnapshot: The snapshot of the comp.
+
+        """
+        snapshot = cls()
+        snapshot._comp = comp
+        snapshot._changes = changes
+        scoped = tools is not None
+        if tools is None:
+            tools = comp.get_tool_list()
+
+        flow = comp.current_frame().FlowView
+        settings = snapshot._copy_settings(tools)
+        pending = []
+        for tool in tools:
+            pending.append(snapshot._add_tool(tool, flow, settings))
+
+        for index, sources in pending:
+            snapshot._connect(index, sources)
+
+        if scoped:
+            snapshot._scope = set(snapshot._by_name)
+        return snapshot
+
+    def _copy_settings(self, tools):
+        """Return the settings of the tools by name, in a single call.
+
+        The tools inside groups are included, their settings are nested in
+        the settings of the group.
+
+        """
+        if not tools:
+            return dict()
+        return tools_by_name(self._comp.copy_settings(tools))
+
+    def _tools_by_name(self, tools):
+        """Return the tools by name, which is a call per tool."""
+        by_name = dict()
+        for tool in tools:
+            by_name[tool.name()] = tool
+        if self._scope is not None:
+            by_name = dict((name, tool) for name, tool in by_name.items()
+                           if name in self._scope)
+        return by_name
+
+    def _add_tool(self, tool, flow, settings):
+        """Add a tool with its inputs and outputs.
+
+        Returns:
+            tuple: The tool index and the (tool name, output id) connected
+                to each of its inputs, by input index.
+
+        """
+        index = len(self._tools)
+        self._tools.append(None)
+        self._objects.append(tool)
+        self._fingerprints.append(None)
+        self._upstream.append(array('i'))
+        self._downstream.append(array('i'))
+        sources = self._query_tool(index, flow, settings)
+        self._fingerprints[index] = _fingerprint(
+            tool, self._changes, settings.get(self._tools[index].name))
+        return index, sources
+
+    def _query_tool(self, index, flow, settings):
+        """(Re)query the name, position, inputs and outputs of a tool.
+
+        The connections and position are read from `settings`, the settings
+        of the tools by name, see `_copy_settings()`.
+
+        The outputs of a tool that is queried again keep their index when
+        their ID is unchanged, so connections to them stay valid.
+
+        Returns:
+            list: The (tool name, output id) connected to each of its
+                inputs, by input index.
+
+        """
+        tool = self._objects[index]
+        reference = tool._reference
+        tool.invalidate_attrs()
+        attrs = tool.get_attrs(['TOOLS_Name', 'TOOLS_RegID'])
+        tool_settings = settings.get(attrs['TOOLS_Name'])
+        if not isinstance(tool_settings, dict):
+            tool_settings = dict()
+
+        pos = (tool_settings.get('ViewInfo') or {}).get('Pos')
+        if pos:
+            pos = (pos[1] / FLOW_GRID[0], pos[2] / FLOW_GRID[1])
+        else:
+            pos = flow.GetPosTable(reference) if flow else None
+            pos = (pos[1], pos[2]) if pos else (0.0, 0.0)
+
+        previous = self._tools[index]
+        record = ToolRecord(index, attrs['TOOLS_Name'],
+                            attrs['TOOLS_RegID'], pos)
+        self._tools[index] = record
+        self._by_name[record.name] = index
+
+        existing = dict()
+        if previous is not None:
+            if self._by_name.get(previous.name) == index and \
+                    previous.name != record.name:
+                del self._by_name[previous.name]
+            for input_index in previous.inputs:
+                self._input_tool[input_index] = -1
+                self._input_source[input_index] = -1
+            existing = dict((self._output_ids[i], i) for i in previous.outputs)
+
+        for output in tool.outputs():
+            id = output.ID
+            key = (record.reg_id, id)
+            data_type = self._output_type_cache.get(key)
+            if data_type is None:
+                data_type = output.data_type()
+                self._output_type_cache[key] = data_type
+
+            output_index = existing.pop(id, None)
+            if output_index is None:
+                output_index = len(self._output_tool)
+                self._output_tool.append(index)
+                self._output_ids.append(id)
+                self._output_types.append(data_type)
+            else:
+                self._output_types[output_index] = data_type
+            record.outputs.append(output_index)
+
+        # Outputs that no longer exist
+        for output_index in existing.values():
+            self._remove_output(output_index)
+
+        # The connections of the tool itself, not those inside a group
+        connected = dict(
+            (input_id, source) for source, (name, input_id) in
+            iter_connections({'Tools': {record.name: tool_settings}})
+            if name == record.name)
+
+        sources = []
+        for input in tool.inputs():
+            id = input.ID
+            input._schema_key = (record.reg_id, id)
+
+            input_index = len(self._input_tool)
+            self._input_tool.append(index)
+            self._input_source.append(-1)
+            self._input_ids.append(id)
+            self._input_types.append(input.schema().data_type)
+            record.inputs.append(input_index)
+
+            if id in connected:
+                sources.append((input_index, connected[id]))
+
+        return sources
+
+    def _remove_output(self, output_index):
+        """Remove an output and disconnect the inputs it's connected to."""
+        index = self._output_tool[output_index]
+        self._output_tool[output_index] = -1
+
+        for other in list(self._downstream[index]):
+            record = self._tools[other]
+            for input_index in record.inputs:
+                if self._input_source[input_index] == output_index:
+                    self._input_source[input_index] = -1
+            self._update_upstream(other)
+
+    def _remove_tool(self, index):
+        """Remove a tool with its inputs, outputs and connections."""
+        record = self._tools[index]
+        for output_index in record.outputs:
+            self._remove_output(output_index)
+        for input_index in record.inputs:
+            self._input_tool[input_index] = -1
+            self._input_source[input_index] = -1
+        self._disconnect_upstream(index)
+
+        if self._by_name.get(record.name) == index:
+            del self._by_name[record.name]
+        self._tools[index] = None
+        self._objects[index] = None
+        self._fingerprints[index] = None
+
+    def _disconnect_upstream(self, index):
+        """Remove a tool from the downstream tools of its upstream tools."""
+        for source in self._upstream[index]:
+            self._downstream[source].remove(index)
+        self._upstream[index] = array('i')
+
+    def _update_upstream(self, index):
+        """Recompute the upstream tools of a tool from its inputs."""
+        self._disconnect_upstream(index)
+        upstream = self._upstream[index]
+        for input_index in self._tools[index].inputs:
+            output_index = self._input_source[input_index]
+            if output_index < 0:
+                continue
+            source = self._output_tool[output_index]
+            if source not in upstream:
+                upstream.append(source)
+                self._downstream[source].append(index)
+
+    def _find_output(self, name, output_id):
+        """Return the index of an output by tool name and ID, -1 if absent."""
+        index = self._by_name.get(name)
+        if index is None:
+            return -1
+        for output_index in self._tools[index].outputs:
+            if self._output_ids[output_index] == output_id:
+                return output_index
+        return -1
+
+    def _connect(self, index, sources):
+        """Connect the inputs of a tool to the outputs they're fed by."""
+        for input_index, (name, output_id) in sources:
+            output_index = self._find_output(name, output_id)
+            if output_index < 0:
+                continue
+            self._input_source[input_index] = output_index
+
+            source = self._output_tool[output_index]
+            if source not in self._upstream[index]:
+                self._upstream[index].append(source)
+                self._downstream[source].append(index)
+
+    def refresh(self):
+        """Update the snapshot to the current state of the comp.
+
+        Only tools that were added, removed or changed are queried again and
+        the connections are patched in place. Added and removed tools are
+        found by comparing the names of the tools in the comp with the
+        snapshot, so a renamed tool is removed and added again. Changed
+        tools are found by comparing their fingerprints (see `build()`).
+        When the snapshot was built for a list of tools only those are
+        refreshed.
+
+        With the default "settings" changes the names are the keys of the
+        copied settings, so the name of each tool is only queried when the
+        amount of tools shows that tools were added or renamed. Otherwise
+        it's a call per tool.
+
+        Returns:
+            dict: The names of the "added", "removed" and "changed" tools.
+
+        """
+        tools = self._comp.get_tool_list()
+        known = dict(self._by_name)
+        result = {"added": [], "removed": [], "changed": []}
+
+        settings = None
+        if self._changes == "settings" and self._scope is None:
+            settings = self._copy_settings(tools)
+            present = [name for name in known if name in settings]
+            by_name = dict()
+            if len(present) != len(tools):
+                by_name = self._tools_by_name(tools)
+            current = set(present).union(by_name)
+        else:
+            by_name = self._tools_by_name(tools)
+            current = set(by_name)
+            if self._changes == "settings":
+                settings = self._copy_settings(list(by_name.values()))
+
+        for name, index in known.items():
+            if name not in current:
+                result["removed"].append(name)
+                self._remove_tool(index)
+
+        added = [tool for name, tool in by_name.items() if name not in known]
+        changed = []
+        if self._changes is not None:
+            for name, index in known.items():
+                if name not in current:
+                    continue
+                fingerprint = _fingerprint(
+                    self._objects[index], self._changes,
+                    settings and settings.get(name))
+                if fingerprint == self._fingerprints[index]:
+                    continue
+
+                self._fingerprints[index] = fingerprint
+                changed.append(index)
+
+        flow = self._comp.current_frame().FlowView
+        if settings is None:
+            settings = self._copy_settings(
+                added + [self._objects[index] for index in changed])
+
+        pending = []
+        for tool in added:
+            index, sources = self._add_tool(tool, flow, settings)
+            result["added"].append(self._tools[index].name)
+            pending.append((index, sources))
+
+        for index in changed:
+            self._disconnect_upstream(index)
+            pending.append((index, self._query_tool(index, flow, settings)))
+            result["changed"].append(self._tools[index].name)
+
+        for index, sources in pending:
+            self._connect(index, sources)
+
+        # A changed tool gets new inputs and removed tools leave their slots
+        # behind, so compact the arrays once half of the slots are unused
+        unused = (self._tools.count(None) + self._input_tool.count(-1) +
+                  self._output_tool.count(-1))
+        if unused * 2 > (len(self._tools) + len(self._input_tool) +
+                         len(self._output_tool)):
+            self._compact()
+
+        return result
+
+    def _compact(self):
+        """Remove the slots of removed tools, inputs and outputs.
+
+        All tools, inputs and outputs get a new index.
+
+        """
+        tools = [index for index, record in enumerate(self._tools)
+                 if record is not None]
+        inputs = [index for index, tool in enumerate(self._input_tool)
+                  if tool >= 0]
+        outputs = [index for index, tool in enumerate(self._output_tool)
+                   if tool >= 0]
+        tool_map = dict((index, new) for new, index in enumerate(tools))
+        input_map = dict((index, new) for new, index in enumerate(inputs))
+        output_map = dict((index, new) for new, index in enumerate(outputs))
+
+        self._input_source = array('i', [
+            output_map.get(self._input_source[index], -1)
+            for index in inputs])
+        self._input_tool = array('i', [tool_map[self._input_tool[index]]
+                                       for index in inputs])
+        self._input_ids = [self._input_ids[index] for index in inputs]
+        self._input_types = [self._input_types[index] for index in inputs]
+
+        self._output_tool = array('i', [tool_map[self._output_tool[index]]
+                                        for index in outputs])
+        self._output_ids = [self._output_ids[index] for index in outputs]
+        self._output_types = [self._output_types[index]
+                               for index in outputs]
+
+        records = []
+        for index in tools:
+            record = self._tools[index]
+            record.index = tool_map[index]
+            record.inputs = array('i', [input_map[i] for i in record.inputs])
+            record.outputs = array('i', [output_map[i]
+                                         for i in record.outputs])
+            records.append(record)
+
+        self._objects = [self._objects[index] for index in tools]
+        self._fingerprints = [self._fingerprints[index] for index in tools]
+        self._upstream = [array('i', [tool_map[i] for i in
+                                      self._upstream[index]])
+                          for index in tools]
+        self._downstream = [array('i', [tool_map[i] for i in
+                                        self._downstream[index]])
+                            for index in tools]
+        self._tools = records
+        self._by_name = dict((record.name, record.index)
+                             for record in records)
+
+    # region queries
+    def _record(self, name):
+        try:
+            return self._tools[self._by_name[name]]
+        except KeyError:
+            raise KeyError("Tool not in snapshot: {0}".format(name))
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def names(self):
+        """Return the names of all tools in the snapshot."""
+        return [record.name for record in self.tools()]
+
+    def tools(self):
+        """Return the `ToolRecord` of all tools in the snapshot."""
+        return [record for record in self._tools if record is not None]
+
+    def tool(self, name):
+        """Return the `ToolRecord` of the tool by name."""
+        return self._record(name)
+
+    def inputs(self, name):
+        """Return the inputs of a tool.
+
+        Returns:
+            list: The (id, data type) of each input.
+
+        """
+        return [(self._input_ids[i], self._input_types[i])
+                for i in self._record(name).inputs]
+
+    def outputs(self, name):
+        """Return the outputs of a tool.
+
+        Returns:
+            list: The (id, data type) of each output.
+
+        """
+        return [(self._output_ids[i], self._output_types[i])
+                for i in self._record(name).outputs]
+
+    def connections(self, name=None):
+        """Return the connections to and from a tool, or of all tools.
+
+        Args:
+            name (str or None): The tool to return the connections for.
+                When None all connections in the snapshot are returned.
+
+        Returns:
+            list: 2-tuples of ((tool, output id), (tool, input id)) for
+                each connection.
+
+        """
+        if name is None:
+            indices = [record.index for record in self.tools()]
+        else:
+            record = self._record(name)
+            indices = [record.index]
+            indices.extend(self._downstream[record.index])
+
+        connections = []
+        for index in indices:
+            record = self._tools[index]
+            for input_index in record.inputs:
+                output_index = self._input_source[input_index]
+                if output_index < 0:
+                    continue
+                source = self._tools[self._output_tool[output_index]]
+                if (name is not None and record.name != name and
+                        source.name != name):
+                    continue
+                connections.append(
+                    ((source.name, self._output_ids[output_index]),
+                     (record.name, self._input_ids[input_index])))
+        return connections
+
+    def upstream(self, name):
+        """Return the names of the tools directly upstream of a tool."""
+        index = self._record(name).index
+        return [self._tools[i].name for i in self._upstream[index]]
+
+    def downstream(self, name):
+        """Return the names of the tools directly downstream of a tool."""
+        index = self._record(name).index
+        return [self._tools[i].name for i in self._downstream[index]]
+    # endregion
@@ -0,0 +1,425 @@
+"""A read-only model of .comp and .setting files that works without Fusion.
+
+The classes mirror the query methods of `Comp`, `Tool`, `Input` and `Output`
+so scripts inspecting comps can run on machines without a running Fusion,
+eg. on the render farm.
+
+Loading a comp only finds where each tool is in the file, see
+`fusionless.settings.tool_spans()`. The settings of a tool are parsed the
+first time they're used, so listing the tools and their types of even large
+comps is fast.
+
+    Example
+        >>> from fusionless.offline import OfflineComp
+        >>> comp = OfflineComp.load("/shots/sh0010/sh0010.comp")
+        >>> print comp.get_attrs()['COMPN_RenderStart']
+        >>> for loader in comp.get_tool_list(node_type="Loader"):
+        >>>     print loader.name(), loader.get_attr('TOOLST_Clip_Name')
+
+.. note::
+    Only Inputs that differ from their default value are stored in a file,
+    so other Inputs aren't available.
+
+"""
+
+from collections import OrderedDict
+
+from . import settings as _settings
+from .settings import FLOW_GRID
+
+
+class OfflineComp(object):
+    """A composition loaded from a .comp or .setting file.
+
+    Args:
+        text (str): The contents of the file.
+        filename (str or None): The path the file was loaded from.
+
+    """
+
+    def __init__(self, text, filename=None):
+        self._text = text
+        self._filename = filename
+        self._inputs_by_source = None
+
+        self._tools = OrderedDict()
+        for name, reg_id, start, end in _settings.tool_spans(text):
+            self._tools[name] = OfflineTool(self, name, reg_id, start, end)
+
+        # Parse everything but the tools right away
+        span = _settings.tools_span(text)
+        if span is not None:
+            text = text[:span[0]] + "Tools = ordered() {}" + text[span[1]:]
+        self._settings = _settings.loads(text)
+
+    @classmethod
+    def load(cls, path):
+        """Load a .comp or .setting file.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            OfflineComp: The loaded composition.
+
+        """
+        with open(path, "r") as f:
+            return cls(f.read(), filename=path)
+
+    def filename(self):
+        """Return the path the comp was loaded from, if any."""
+        return self._filename
+
+    def get_attrs(self):
+        """Return the attributes of the comp that are stored in the file.
+
+        The same keys as `Comp.get_attrs()` are used, eg. "COMPN_RenderStart".
+
+        Returns:
+            dict: The attributes.
+
+        """
+        attrs = {'COMPS_FileName': self._filename or ""}
+        for key, attr in (('RenderRange', 'COMPN_Render'),
+                          ('GlobalRange', 'COMPN_Global')):
+            frame_range = self._settings.get(key)
+            if frame_range:
+                attrs[attr + 'Start'] = frame_range[1.0]
+                attrs[attr + 'End'] = frame_range[2.0]
+        if 'CurrentTime' in self._settings:
+            attrs['COMPN_CurrentTime'] = self._settings['CurrentTime']
+        return attrs
+
+    def get_attr(self, key):
+        return self.get_attrs()[key]
+
+    def get_current_time(self):
+        """Return the current time stored in the comp, 0 if not stored."""
+        return self._settings.get('CurrentTime', 0.0)
+
+    def get_tool_list(self, node_type=None):
+        """Return the tools of this composition.
+
+        Args:
+            node_type (str): If provided filter to only tools of this type.
+
+        Returns:
+            list: A list of OfflineTool instances
+
+        """
+        return [tool for tool in self._tools.values()
+                if node_type is None or tool.reg_id() == node_type]
+
+    def find_tool(self, name):
+        """Return the tool by name, None if there's no tool with that name."""
+        return self._tools.get(name)
+
+    def get_active_tool(self):
+        """Return the tool that was active when the file was saved, if any."""
+        name = self._settings.get('ActiveTool')
+        return self._tools.get(name) if name else None
+
+    def _get_inputs_by_source(self):
+        """Return the connected Inputs by (tool name, output id).
+
+        This is only needed to look up connections downstream, so it's built
+        on first use. It requires all tools to be parsed.
+
+        """
+        if self._inputs_by_source is None:
+            self._inputs_by_source = dict()
+            for tool in self._tools.values():
+                for input in tool.inputs():
+                    source = input._source()
+                    if source is not None:
+                        self._inputs_by_source.setdefault(
+                            source, []).append(input)
+        return self._inputs_by_source
+
+    def __repr__(self):
+        return '{0}("{1}")'.format(self.__class__.__name__,
+                                   self._filename or "")
+
+
+class OfflineTool(object):
+    """A tool in an `OfflineComp`."""
+
+    def __init__(self, comp, name, reg_id, start, end):
+        self._comp = comp
+        self._name = name
+        self._reg_id = reg_id
+        self._span = (start, end)
+        self._settings = None
+
+    def _get_settings(self):
+        if self._settings is None:
+            start, end = self._span
+            self._settings = _settings.loads(self._comp._text[start:end])
+        return self._settings
+
+    def name(self):
+        return self._name
+
+    def reg_id(self):
+        """Return the registry ID of this Tool's type, eg. "Background"."""
+        return self._reg_id
+
+    def comp(self):
+        return self._comp
+
+    def get_attrs(self):
+        """Return the attributes of the tool that are stored in the file.
+
+        The same keys as `Tool.get_attrs()` are used. For Loaders and Savers
+        the filenames are returned as "TOOLST_Clip_Name".
+
+        Returns:
+            dict: The attributes.
+
+        """
+        settings = self._get_settings()
+        attrs = {'TOOLS_Name': self._name,
+                 'TOOLS_RegID': self._reg_id,
+                 'TOOLB_PassThrough': settings.get('PassThrough', False),
+                 'TOOLB_NameSet': settings.get('NameSet', False)}
+
+        filenames = []
+        if self._reg_id == "Loader":
+            clips = settings.get('Clips') or {}
+            for key in sorted(key for key in clips if key != '__ctor'):
+                filenames.append(clips[key].get('Filename'))
+        elif self._reg_id == "Saver":
+            input = self.input("Clip")
+            clip = input.get_value() if input is not None else None
+            if isinstance(clip, dict):
+                filenames.append(clip.get('Filename'))
+        if filenames:
+            attrs['TOOLST_Clip_Name'] = dict((float(index + 1), filename)
+                                             for index, filename
+                                             in enumerate(filenames))
+        return attrs
+
+    def get_attr(self, key):
+        return self.get_attrs()[key]
+
+    def get_pos(self):
+        """Return the X and Y position of this tool in the Flow.
+
+        Returns:
+            list(float, float): The X and Y coordinate of the tool, None if
+                not stored.
+
+        """
+        view_info = self._get_settings().get('ViewInfo') or {}
+        pos = view_info.get('Pos')
+        if not pos:
+            return None
+        return [pos[1.0] / FLOW_GRID[0], pos[2.0] / FLOW_GRID[1]]
+
+    def input(self, id):
+        """Returns an Input by ID, None if it's not stored in the file."""
+        inputs = self._get_settings().get('Inputs') or {}
+        input_settings = inputs.get(id)
+        if not isinstance(input_settings, dict):
+            return None
+        return OfflineInput(self, id, input_settings)
+
+    def inputs(self):
+        """Return the Inputs of this tool that are stored in the file."""
+        inputs = self._get_settings().get('Inputs') or {}
+        return [OfflineInput(self, id, input_settings)
+                for id, input_settings in inputs.items()
+                if isinstance(input_settings, dict)]
+
+    def output(self, id):
+        """Returns the Output by ID.
+
+        Outputs aren't stored in files, so this doesn't check whether the
+        tool has an Output with that ID.
+
+        """
+        return OfflineOutput(self, id)
+
+    def connections(self, inputs=True, outputs=True):
+        """Return all Input and Output connections of this Tool.
+
+        Looking up the connections of the outputs parses all tools in the
+        comp the first time.
+
+        Returns:
+            A list of 2-tuples (OfflineOutput, OfflineInput) representing each
+            connection to or from this Tool.
+
+        """
+        connections = []
+        if inputs:
+            for input in self.inputs():
+                output = input.get_connected_output()
+                if output is not None:
+                    connections.append((output, input))
+
+        if outputs:
+            inputs_by_source = self._comp._get_inputs_by_source()
+            for (name, output_id), connected in sorted(
+                    inputs_by_source.items()):
+                if name != self._name:
+                    continue
+                output = OfflineOutput(self, output_id)
+                for input in connected:
+                    connections.append((output, input))
+        return connections
+
+    def save_settings(self):
+        """Return the settings table of this tool, like `Tool.save_settings()`
+
+        Returns:
+            dict: The settings table. It's shared by all calls, so it
+                shouldn't be modified.
+
+        """
+        return {'Tools': {self._name: self._get_settings()}}
+
+    def __repr__(self):
+        return '{0}("{1}")'.format(self.__class__.__name__, self._name)
+
+
+class OfflineInput(object):
+    """An Input of an `OfflineTool`."""
+
+    def __init__(self, tool, id, settings):
+        self._tool = tool
+        self._id = id
+        self._settings = settings
+
+    def id(self):
+        return self._id
+
+    def tool(self):
+        return self._tool
+
+    def _source(self):
+        """Return the (tool name, output id) this Input is connected to."""
+        if self._settings.get('__ctor', 'Input') != 'Input':
+            return None
+        source = self._settings.get('SourceOp')
+        if source is None:
+            return None
+        return source, self._settings.get('Source', 'Output')
+
+    def get_connected_output(self):
+        """Returns the output that is connected to this input.
+
+        Returns:
+            OfflineOutput: The Output this Input is connected to if any,
+                else None.
+
+        """
+        source = self._source()
+        if source is None:
+            return None
+        tool = self._tool.comp().find_tool(source[0])
+        if tool is None:
+            return None
+        return OfflineOutput(tool, source[1])
+
+    def is_connected(self):
+        return self.get_connected_output() is not None
+
+    def get_expression(self):
+        """Return the expression of this Input, if any."""
+        return self._settings.get('Expression')
+
+    def _get_spline(self):
+        output = self.get_connected_output()
+        if output is not None and output.tool().reg_id() == "BezierSpline":
+            return output.tool()
+
+    def get_keyframes(self):
+        """Return the times at which this Input has keys.
+
+        Returns:
+            list: The times in order, None if the Input isn't animated.
+
+        """
+        spline = self._get_spline()
+        if spline is None:
+            return None
+        keyframes = spline._get_settings().get('KeyFrames') or {}
+        return sorted(keyframes)
+
+    def get_value(self, time=None):
+        """Return the value of this Input.
+
+        For Inputs animated by a BezierSpline the value is interpolated
+        linearly between the keys, the handles of the keys are ignored.
+
+        Args:
+            time (float or None): The time to return the value at. Defaults
+                to the current time stored in the comp.
+
+        Returns:
+            The value, None if it's connected to another tool or not stored.
+
+        """
+        if 'Value' in self._settings:
+            return self._settings['Value']
+
+        spline = self._get_spline()
+        if spline is None:
+            return None
+
+        if time is None:
+            time = self._tool.comp().get_current_time()
+        keyframes = spline._get_settings().get('KeyFrames') or {}
+        times = sorted(keyframes)
+        if not times:
+            return None
+        if time <= times[0]:
+            return keyframes[times[0]][1.0]
+
+        previous = times[0]
+        for key in times:
+            if key == time:
+                return keyframes[key][1.0]
+            if key > time:
+                before = keyframes[previous]
+                flags = before.get('Flags') or {}
+                if flags.get('StepOut') or flags.get('StepIn'):
+                    return before[1.0]
+                weight = (time - previous) / float(key - previous)
+                return (before[1.0] +
+                        (keyframes[key][1.0] - before[1.0]) * weight)
+            previous = key
+        return keyframes[times[-1]][1.0]
+
+    def __repr__(self):
+        return '{0}("{1}")'.format(self.__class__.__name__, self._id)
+
+
+class OfflineOutput(object):
+    """An Output of an `OfflineTool`."""
+
+    def __init__(self, tool, id):
+        self._tool = tool
+        self._id = id
+
+    def id(self):
+        return self._id
+
+    def tool(self):
+        return self._tool
+
+    def get_connected_inputs(self):
+        """Returns a list of all Inputs that are connected to this Output.
+
+        This parses all tools in the comp the first time.
+
+        """
+        inputs_by_source = self._tool.comp()._get_inputs_by_source()
+        return list(inputs_by_source.get((self._tool.name(), self._id), ()))
+
+    def is_connected(self):
+        return bool(self.get_connected_inputs())
+
+    def __repr__(self):
+        return '{0}("{1}")'.format(self.__class__.__name__, self._id)
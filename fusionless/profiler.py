@@ -0,0 +1,288 @@
+"""Profile the render cost of each tool in a composition.
+
+The cost of a tool's main Output as reported by `Output.get_time_cost()`
+includes rendering everything upstream of it. The profiler samples that cost
+for every tool over a frame range and attributes to each tool only its own
+cost by subtracting the cost of its upstream tools. From that it reports the
+hot spots and the critical path: the chain of tools with the highest
+combined cost.
+
+    Example
+        >>> import fusionless as fu
+        >>> from fusionless.profiler import profile_comp
+        >>> profile = profile_comp(fu.Comp(), start=1001, end=1100, stride=10)
+        >>> print profile.report()
+        >>> profile.to_csv("D:/profile.csv")
+
+"""
+
+import csv
+import sys
+import json
+
+
+class ToolProfile(object):
+    """The sampled render cost of a single tool.
+
+    Attributes:
+        name (str): The name of the tool.
+        reg_id (str): The registry ID of the tool's type.
+        samples (dict): The sampled cost of the main Output per time.
+        sources (set): Names of the profiled tools directly upstream.
+        upstream (set): Names of all profiled tools upstream.
+        self_cost (float): Mean cost attributed to the tool itself.
+
+    """
+
+    def __init__(self, name, reg_id, samples, sources):
+        self.name = name
+        self.reg_id = reg_id
+        self.samples = samples
+        self.sources = sources
+        self.upstream = set()
+        self.self_cost = 0.0
+
+    @property
+    def total_cost(self):
+        """Mean cost of the main Output, including all upstream tools"""
+        if not self.samples:
+            return 0.0
+        return sum(self.samples.values()) / float(len(self.samples))
+
+    def as_dict(self):
+        return {'name': self.name,
+                'type': self.reg_id,
+                'self_cost': self.self_cost,
+                'total_cost': self.total_cost,
+                'samples': dict((str(time), cost) for time, cost
+                                in sorted(self.samples.items()))}
+
+    def __repr__(self):
+        return '{0}("{1}", self_cost={2:.4f})'.format(
+            self.__class__.__name__, self.name, self.self_cost)
+
+
+class CompProfile(object):
+    """The render cost of the tools in a comp, see `profile_comp()`.
+
+    Args:
+        tools (list): The `ToolProfile` for each profiled tool.
+
+    """
+
+    def __init__(self, tools):
+        self.tools = dict((tool.name, tool) for tool in tools)
+        self._attribute()
+
+    def _attribute(self):
+        """Compute the upstream tools and the self cost of each tool."""
+        memo = dict()
+
+        def upstream(name, visiting):
+            """Return the upstream tools and whether no cycle was cut."""
+            if name in memo:
+                return memo[name], True
+            visiting.add(name)
+            result = set()
+            complete = True
+            for source in self.tools[name].sources:
+                if source not in self.tools:
+                    continue    # not profiled, eg. without a main Output
+                if source in visiting:
+                    complete = False    # cycle, eg. through expressions
+                    continue
+                result.add(source)
+                source_upstream, source_complete = upstream(source, visiting)
+                result.update(source_upstream)
+                complete = complete and source_complete
+            visiting.discard(name)
+
+            # Only memoize results that don't miss the tools of a cycle
+            # that is still being visited
+            if complete:
+                memo[name] = result
+            return result, complete
+
+        for name, tool in self.tools.items():
+            tool.upstream = upstream(name, set())[0]
+
+        # Upstream tools always have fewer upstream tools themselves, so
+        # their self cost is known by the time it's needed.
+        for tool in self.ordered():
+            cost = tool.total_cost - sum(self.tools[name].self_cost
+                                         for name in tool.upstream)
+            tool.self_cost = max(0.0, cost)
+
+    def ordered(self):
+        """Return the tool profiles with upstream tools first.
+
+        Returns:
+            list: The `ToolProfile` instances.
+
+        """
+        return sorted(self.tools.values(),
+                      key=lambda tool: (len(tool.upstream), tool.name))
+
+    def hot_spots(self, count=10):
+        """Return the tools with the highest self cost.
+
+        Args:
+            count (int or None): The amount of tools to return. When None
+                all tools are returned.
+
+        Returns:
+            list: The `ToolProfile` instances, most expensive first.
+
+        """
+        tools = sorted(self.tools.values(),
+                       key=lambda tool: tool.self_cost,
+                       reverse=True)
+        return tools if count is None else tools[:count]
+
+    def critical_path(self):
+        """Return the chain of connected tools with the highest total cost.
+
+        Returns:
+            list: The `ToolProfile` instances on the path, upstream first.
+
+        """
+        best = dict()
+        previous = dict()
+        for tool in self.ordered():
+            sources = [name for name in tool.sources
+                       if name in best and name in tool.upstream]
+            source = max(sources, key=lambda name: best[name]) \
+                if sources else None
+            best[tool.name] = tool.self_cost + (best[source] if source else 0)
+            previous[tool.name] = source
+
+        if not best:
+            return []
+
+        path = []
+        name = max(best, key=lambda name: best[name])
+        while name is not None:
+            path.append(self.tools[name])
+            name = previous[name]
+        return list(reversed(path))
+
+    def report(self, count=10):
+        """Return a readable report of the hot spots and critical path.
+
+        Args:
+            count (int): The amount of hot spots to list.
+
+        Returns:
+            str: The report.
+
+        """
+        total = sum(tool.self_cost for tool in self.tools.values()) or 1.0
+
+        lines = ["Hot spots:"]
+        for tool in self.hot_spots(count):
+            lines.append("  {0:<30} {1:<20} {2:>10.4f}s {3:>6.1f}%".format(
+                tool.name, tool.reg_id, tool.self_cost,
+                100.0 * tool.self_cost / total))
+
+        path = self.critical_path()
+        lines.append("")
+        lines.append("Critical path ({0:.4f}s):".format(
+            sum(tool.self_cost for tool in path)))
+        for tool in path:
+            lines.append("  {0:<30} {1:>10.4f}s".format(tool.name,
+                                                        tool.self_cost))
+        return "\n".join(lines)
+
+    def to_json(self, path=None):
+        """Export the profile as JSON.
+
+        Args:
+            path (str or None): The file to write to, if any.
+
+        Returns:
+            str: The JSON data.
+
+        """
+        data = json.dumps({
+            'tools': [tool.as_dict() for tool in self.hot_spots(None)],
+            'critical_path': [tool.name for tool in self.critical_path()]
+        }, indent=4, sort_keys=True)
+
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(data)
+        return data
+
+    def to_csv(self, path):
+        """Export the cost of each tool as CSV.
+
+        Args:
+            path (str): The file to write to.
+
+        """
+        critical = set(tool.name for tool in self.critical_path())
+        if sys.version_info[0] < 3:
+            f = open(path, "wb")
+        else:
+            # The csv module writes its own line endings
+            f = open(path, "w", newline="")
+        with f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "type", "self_cost", "total_cost",
+                             "critical"])
+            for tool in self.hot_spots(None):
+                writer.writerow([tool.name, tool.reg_id,
+                                 "{0:.6f}".format(tool.self_cost),
+                                 "{0:.6f}".format(tool.total_cost),
+                                 int(tool.name in critical)])
+
+
+def profile_comp(comp, start=None, end=None, stride=1, tools=None):
+    """Sample the render cost of the tools of a comp over a frame range.
+
+    .. note:: This evaluates the main Output of each tool at each sampled
+        frame and could take as long as rendering those frames.
+
+    Args:
+        comp (Comp): The composition to profile.
+        start (int or None): First frame. Defaults to the render start.
+        end (int or None): Last frame. Defaults to the render end.
+        stride (int): Sample every n-th frame in the range.
+        tools (list or None): The tools to profile. When None all tools in
+            the comp are profiled. Tools without a main Output are skipped.
+
+    Returns:
+        CompProfile: The profile of the comp.
+
+    """
+    if start is None or end is None:
+        attrs = comp.get_attrs(['COMPN_RenderStart', 'COMPN_RenderEnd'])
+        if start is None:
+            start = int(attrs['COMPN_RenderStart'])
+        if end is None:
+            end = int(attrs['COMPN_RenderEnd'])
+    times = list(range(start, end + 1, stride))
+
+    if tools is None:
+        tools = comp.get_tool_list()
+
+    profiles = []
+    with comp.cached_attrs():
+        names = set(tool.name() for tool in tools)
+        for tool in tools:
+            if not tool._reference.FindMainOutput(1):
+                continue
+            output = tool.main_output(1)
+            samples = dict((time, output.get_time_cost(time))
+                           for time in times)
+
+            sources = set()
+            for connected_output, _ in tool.connections(outputs=False):
+                name = connected_output.tool().name()
+                if name in names:
+                    sources.add(name)
+
+            profiles.append(ToolProfile(tool.name(), tool.reg_id(),
+                                        samples, sources))
+
+    return CompProfile(profiles)
@@ -0,0 +1,833 @@
+"""Utilities for Fusion settings tables.
+
+A settings table is what `Tool.save_settings()` and `Comp.copy_settings()`
+return and what `Tool.load_settings()` and `Comp.paste()` accept: a (nested)
+dictionary describing tools, their inputs and their connections.
+
+The same tables are stored as Lua in .setting and .comp files, which `loads()`
+and `load()` parse without Fusion. They're returned like Fusion returns them
+to Python:
+
+    - Numbers are floats, also when used as keys.
+    - The items of a list are stored by their 1-based index.
+    - The constructor of a table, eg. `Input { ... }`, is stored as
+      "__ctor" and `ordered()` tables get `ORDERED` as "__flags".
+
+    Example
+        >>> from fusionless import settings
+        >>> comp = settings.load("D:/shot.comp")
+        >>> print comp['RenderRange']
+        >>> for name, tool in settings.iter_tools(open("D:/shot.comp").read(),
+        >>>                                       types=["Loader"]):
+        >>>     print name, tool['Clips']
+
+"""
+
+import re
+import math
+import hashlib
+from collections import OrderedDict
+
+try:
+    # Also the name imported by the other modules
+    basestring = basestring
+except NameError:
+    # Python 3
+    basestring = str
+
+# The "__flags" of an `ordered()` table
+ORDERED = 2097152
+
+# The size of a grid unit of the Flow in the positions stored in settings
+FLOW_GRID = (110.0, 33.0)
+
+_TOKENS = re.compile(r"""
+    (?:\s+|--\[\[.*?\]\]|--[^\n]*)*        # whitespace and comments
+    (
+        "(?:[^"\\]|\\.)*"                  # strings
+      | '(?:[^'\\]|\\.)*'
+      | \[\[.*?\]\]|\[=\[.*?\]=\]|\[==\[.*?\]==\]
+      | -?0[xX][0-9a-fA-F]+                   # numbers
+      | -?\d+\.\#(?:INF|IND|QNAN|SNAN)\w*
+      | -?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?
+      | -(?:math\.huge|inf|nan)(?![\w.])
+      | [A-Za-z_][\w.]*                       # names
+      | \S                                   # symbols
+    )""", re.VERBOSE | re.DOTALL)
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_]\w*$")
+_KEYWORDS = frozenset(['and', 'break', 'do', 'else', 'elseif', 'end', 'false',
+                       'for', 'function', 'if', 'in', 'local', 'nil', 'not',
+                       'or', 'repeat', 'return', 'then', 'true', 'until',
+                       'while'])
+_ESCAPES = re.compile(r"\\(\d{1,3}|.)", re.DOTALL)
+_ESCAPED = {'n': '\n', 't': '\t', 'r': '\r', 'a': '\a', 'b': '\b',
+            'f': '\f', 'v': '\v', '\n': '\n'}
+
+# Structure of the text around tools, used to skip tools while streaming
+_TOOLS_TABLE = re.compile(r"\bTools\s*=\s*(?:ordered\(\)\s*)?\{")
+_TOOL_HEADER = re.compile(r"""
+    (?:\s+|--\[\[.*?\]\]|--[^\n]*|,)*
+    ([A-Za-z_]\w*|\["(?:[^"\\]|\\.)*"\])\s*=\s*
+    ([A-Za-z_][\w.]*)\s*\{""", re.VERBOSE | re.DOTALL)
+_INDENT = re.compile(r"[ \t]*")
+_BRACES = re.compile(r"""
+    "(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'
+  | \[\[.*?\]\]|\[=\[.*?\]=\]|\[==\[.*?\]==\]
+  | --\[\[.*?\]\]|--[^\n]*
+  | [{}]""", re.VERBOSE | re.DOTALL)
+
+
+def _stable_repr(value):
+    """Return a repr of `value` that doesn't depend on dictionary order."""
+    if isinstance(value, dict):
+        items = sorted((repr(key), _stable_repr(item))
+                       for key, item in value.items())
+        return "{" + ", ".join("{0}: {1}".format(*item)
+                               for item in items) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_stable_repr(item) for item in value) + "]"
+    return repr(value)
+
+
+def settings_hash(settings, ignore=()):
+    """Return a hash of a settings table that doesn't depend on key order.
+
+    Args:
+        settings (dict): The settings table, eg. from `Tool.save_settings()`.
+        ignore (iterable): Keys to leave out of the settings of each tool,
+            eg. "ViewInfo" to ignore the position of the tools in the Flow.
+
+    Returns:
+        str: The hexadecimal digest of the settings.
+
+    """
+    settings = settings or {}
+    if ignore:
+        tools = dict()
+        for name, tool_settings in (settings.get('Tools') or {}).items():
+            if isinstance(tool_settings, dict):
+                tool_settings = dict((key, value) for key, value
+                                     in tool_settings.items()
+                                     if key not in ignore)
+            tools[name] = tool_settings
+        settings = dict(settings, Tools=tools)
+
+    return hashlib.md5(_stable_repr(settings).encode('utf-8')).hexdigest()
+
+
+def iter_connections(settings):
+    """Yield the connections stored in a settings table.
+
+    Each connection is yielded as `((tool, output id), (tool, input id))`
+    with the names of the tools. The tools of groups and macros in the table
+    are included, connections to keyframe splines and modifiers too.
+
+    Args:
+        settings (dict): A settings table, eg. from `Tool.save_settings()` or
+            `Comp.copy_settings()`.
+
+    Yields:
+        tuple: A 2-tuple for each connection.
+
+    """
+    tools = (settings or {}).get('Tools') or {}
+    for name, tool_settings in tools.items():
+        if not isinstance(tool_settings, dict):
+            continue
+
+        inputs = tool_settings.get('Inputs') or {}
+        for id, input_settings in inputs.items():
+            if not isinstance(input_settings, dict):
+                continue
+            if input_settings.get('__ctor', 'Input') != 'Input':
+                continue    # eg. the InstanceInput of a macro
+            source = input_settings.get('SourceOp')
+            if source is None:
+                continue
+            output = input_settings.get('Source', 'Output')
+            yield (source, output), (name, id)
+
+        if 'Tools' in tool_settings:
+            # A group or macro
+            for connection in iter_connections(tool_settings):
+                yield connection
+
+
+def tools_by_name(settings):
+    """Return the settings of the tools in a settings table by name.
+
+    The tools inside groups and macros are included, their settings are
+    nested in the settings of the group.
+
+    Args:
+        settings (dict): A settings table, eg. from `Comp.copy_settings()`.
+
+    Returns:
+        dict: The settings table of each tool by its name.
+
+    """
+    result = dict()
+    pending = [(settings or {}).get('Tools') or {}]
+    while pending:
+        for name, tool_settings in pending.pop().items():
+            if not isinstance(tool_settings, dict):
+                continue
+            result[name] = tool_settings
+            if isinstance(tool_settings.get('Tools'), dict):
+                pending.append(tool_settings['Tools'])
+    return result
+
+
+def get_connections(comp, tools, settings=None):
+    """Return the connections to the inputs of tools as (Output, Input).
+
+    Where `Tool.connections()` queries Fusion for the connection of every
+    Input, this reads all connections from a single settings table and only
+    queries Fusion to look up the connected Inputs and Outputs.
+
+    Args:
+        comp (Comp): The composition of the tools.
+        tools (list): The tools to return the connections of.
+        settings (dict or None): The settings table of the tools, if already
+            available. When None it's retrieved with `Tool.save_settings()`
+            for a single tool or `Comp.copy_settings()` for more tools.
+
+    Returns:
+        list: A 2-tuple (Output, Input) for each connection.
+
+    """
+    from .core import Tool
+
+    if settings is None:
+        if len(tools) == 1:
+            settings = tools[0].save_settings()
+        else:
+            settings = comp.copy_settings(tools)
+
+    by_name = dict()
+
+    def find(name):
+        if name not in by_name:
+            reference = comp._reference.FindTool(name)
+            by_name[name] = Tool(reference) if reference else None
+        return by_name[name]
+
+    connections = []
+    for (source, output_id), (target, input_id) in iter_connections(settings):
+        source = find(source)
+        target = find(target)
+        if source is None or target is None:
+            continue
+        output = source.output(output_id)
+        if output is None:
+            continue
+        connections.append((output, target.input(input_id)))
+    return connections
+
+
+def bezier_keyframes(points, interpolation="smooth"):
+    """Return a BezierSpline's KeyFrames settings table for the given points.
+
+    Args:
+        points (list): Sorted list of (time, value) 2-tuples.
+        interpolation (str): "smooth", "linear" or "step".
+
+    Returns:
+        dict: The KeyFrames table mapping each time to its key.
+
+    """
+    if interpolation not in ("smooth", "linear", "step"):
+        raise ValueError("Invalid interpolation: {0}".format(interpolation))
+
+    keyframes = dict()
+    count = len(points)
+    for i, (time, value) in enumerate(points):
+        previous = points[i - 1] if i > 0 else None
+        next = points[i + 1] if i < count - 1 else None
+
+        key = {1: value}
+        if interpolation == "smooth" and previous and next:
+            # Tangent through the neighbouring keys
+            slope = (next[1] - previous[1]) / (next[0] - previous[0])
+        else:
+            slope = None
+
+        # Handles are placed at a third of the way towards the neighbours
+        if previous:
+            dt = (time - previous[0]) / 3.0
+            if slope is None:
+                dv = (value - previous[1]) / 3.0
+            else:
+                dv = slope * dt
+            key['LH'] = {1: time - dt, 2: value - dv}
+        if next:
+            dt = (next[0] - time) / 3.0
+            if slope is None:
+                dv = (next[1] - value) / 3.0
+            else:
+                dv = slope * dt
+            key['RH'] = {1: time + dt, 2: value + dv}
+
+        if interpolation == "linear":
+            key['Flags'] = {'Linear': True}
+        elif interpolation == "step":
+            key['Flags'] = {'StepOut': True}
+
+        keyframes[time] = key
+
+    return keyframes
+
+
+class SettingsParseError(ValueError):
+    """Raised when the text of a settings table can't be parsed"""
+
+
+def _unescape(match):
+    char = match.group(1)
+    if char.isdigit():
+        return chr(int(char))
+    return _ESCAPED.get(char, char)
+
+
+def _number_token(token):
+    """Return the value of a number token.
+
+    Besides decimal numbers these are hexadecimal numbers, `math.huge` and
+    the infinity and NaN values as written by Lua and the C runtime of
+    Fusion on Windows, eg. `1.#INF` and `-1.#IND`.
+
+    """
+    negative = token[:1] == '-'
+    body = token[1:] if negative else token
+    if body[:2] in ('0x', '0X'):
+        value = float(int(body, 16))
+    elif '#' in body:
+        value = float('inf' if body.split('#')[1][:3] == 'INF' else 'nan')
+    elif body in ('math.huge', 'inf'):
+        value = float('inf')
+    elif body == 'nan':
+        value = float('nan')
+    else:
+        value = float(body)
+    return -value if negative else value
+
+
+def _string(token):
+    """Return the value of a string token"""
+    if token[0] == '[':
+        # Long string, a leading newline is ignored
+        level = token.index('[', 1) + 1
+        value = token[level:-level]
+        return value[1:] if value[:1] == '\n' else value
+    value = token[1:-1]
+    if '\\' in value:
+        value = _ESCAPES.sub(_unescape, value)
+    return value
+
+
+class _Parser(object):
+    """Recursive descent parser over the tokens of a Lua table"""
+
+    CONSTANTS = {'true': True, 'false': False, 'nil': None}
+    NUMBERS = frozenset(['math.huge', 'inf', 'nan'])
+
+    def __init__(self, text):
+        self.tokens = _TOKENS.findall(text)
+        self.tokens.append('')      # end of text
+
+    def error(self, index, message):
+        context = " ".join(self.tokens[max(0, index - 5):index + 5])
+        raise SettingsParseError("{0} at token {1}: {2}".format(
+            message, index, context))
+
+    def expect(self, index, token):
+        if self.tokens[index] != token:
+            self.error(index, "Expected '{0}'".format(token))
+        return index + 1
+
+    def value(self, index):
+        """Parse the value at `index`.
+
+        Returns:
+            tuple: The value and the index of the next token.
+
+        """
+        token = self.tokens[index]
+        char = token[:1]
+        if char == '{':
+            return self.table(index + 1)
+        if char == '"' or char == "'" or token[:2] in ('[[', '[='):
+            return _string(token), index + 1
+        if char.isdigit() or char == '-' or char == '.':
+            try:
+                return _number_token(token), index + 1
+            except ValueError:
+                self.error(index, "Invalid number")
+        if char.isalpha() or char == '_':
+            if token in self.CONSTANTS:
+                return self.CONSTANTS[token], index + 1
+            if token in self.NUMBERS:
+                return _number_token(token), index + 1
+            following = self.tokens[index + 1]
+            if following == '{':
+                return self.table(index + 2, ctor=token)
+            if following == '(':
+                # A call like `ordered()` preceding a table
+                index = self.expect(index + 2, ')')
+                index = self.expect(index, '{')
+                flags = ORDERED if token == 'ordered' else None
+                return self.table(index, flags=flags)
+            self.error(index, "Unsupported expression '{0}'".format(token))
+        self.error(index, "Unexpected token")
+
+    def table(self, index, ctor=None, flags=None):
+        """Parse the fields of a table up to its closing brace.
+
+        Args:
+            index (int): The index of the token after the opening brace.
+
+        Returns:
+            tuple: The table and the index of the next token.
+
+        """
+        tokens = self.tokens
+        # Keep the order of `ordered()` tables, eg. of the tools of a comp
+        table = OrderedDict() if flags == ORDERED else dict()
+        if ctor is not None:
+            table['__ctor'] = ctor
+        if flags is not None:
+            table['__flags'] = flags
+
+        position = 1.0
+        value = self.value
+        while True:
+            token = tokens[index]
+            if token == '}':
+                return table, index + 1
+            if token == '':
+                self.error(index, "Unexpected end of text")
+
+            if token == '[':
+                key, index = value(index + 1)
+                index = self.expect(index, ']')
+                index = self.expect(index, '=')
+                table[key], index = value(index)
+            elif tokens[index + 1] == '=' and (token[0].isalpha() or
+                                               token[0] == '_'):
+                table[token], index = value(index + 2)
+            else:
+                table[position], index = value(index)
+                position += 1.0
+
+            token = tokens[index]
+            if token == ',' or token == ';':
+                index += 1
+            elif token != '}':
+                self.error(index, "Expected ',' or '}'")
+
+
+def loads(text):
+    """Parse the text of a .setting or .comp file to a settings table.
+
+    Args:
+        text (str): The Lua table, optionally preceded by a constructor as in
+            .comp files, eg. `Composition { ... }`.
+
+    Returns:
+        dict: The settings table.
+
+    Raises:
+        SettingsParseError: When the text isn't a valid table.
+
+    """
+    parser = _Parser(text)
+    settings, index = parser.value(0)
+    if parser.tokens[index] != '':
+        parser.error(index, "Unexpected text after table")
+    return settings
+
+
+def load(path):
+    """Parse a .setting or .comp file to a settings table, see `loads()`.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        dict: The settings table.
+
+    """
+    with open(path, "r") as f:
+        return loads(f.read())
+
+
+def _block_end(text, index):
+    """Return the index after the brace closing the table opened before
+    `index`.
+
+    Fusion indents every nested table, so the closing brace of a table that
+    starts on its own line is first looked up by the indentation of that
+    line. Otherwise, or when the braces in between don't balance, all braces
+    are matched.
+
+    """
+    line = text.rfind('\n', 0, index) + 1
+    indent = _INDENT.match(text, line).group()
+    close = text.find('\n' + indent + '}', index)
+    if close != -1:
+        end = close + len(indent) + 2
+        if text.count('{', index, end) + 1 == text.count('}', index, end):
+            return end
+
+    depth = 1
+    for match in _BRACES.finditer(text, index):
+        brace = match.group()
+        if brace == '{':
+            depth += 1
+        elif brace == '}':
+            depth -= 1
+            if not depth:
+                return match.end()
+    raise SettingsParseError("Unclosed table at {0}".format(index))
+
+
+def tool_spans(text):
+    """Yield where each tool is in the text of a .setting or .comp file.
+
+    This only matches the braces of the tools, so it's a lot faster than
+    parsing them. Tools inside groups are part of the span of the group.
+
+    Args:
+        text (str): The text of the file.
+
+    Yields:
+        tuple: The name, registry ID and the start and end index of the
+            settings table of each tool, eg. `loads(text[start:end])`.
+
+    """
+    match = _TOOLS_TABLE.search(text)
+    if not match:
+        return
+
+    index = match.end()
+    while True:
+        match = _TOOL_HEADER.match(text, index)
+        if not match:
+            return
+        name, ctor = match.groups()
+        if name[0] == '[':
+            name = _string(name[1:-1])
+        end = _block_end(text, match.end())
+        yield name, ctor, match.start(2), end
+        index = end
+
+
+def tools_span(text):
+    """Return the start and end index of the `Tools` table in a file.
+
+    Args:
+        text (str): The text of a .setting or .comp file.
+
+    Returns:
+        tuple or None: The start of the `Tools` key and the end of its table,
+            None when there's no `Tools` table.
+
+    """
+    match = _TOOLS_TABLE.search(text)
+    if not match:
+        return None
+    return match.start(), _block_end(text, match.end())
+
+
+def iter_tools(text, types=None):
+    """Yield the tools of a .setting or .comp file without parsing it all.
+
+    Only the settings of tools of the given types are parsed, the others are
+    skipped, see `tool_spans()`.
+
+    Args:
+        text (str): The text of the file.
+        types (list or None): The registry IDs of the tools to yield, eg.
+            ["Loader", "Saver"]. When None all tools are yielded.
+
+    Yields:
+        tuple: The name and the settings table of each tool.
+
+    """
+    if types is not None:
+        types = set(types)
+
+    for name, ctor, start, end in tool_spans(text):
+        if types is None or ctor in types:
+            yield name, loads(text[start:end])
+
+
+def _number(value):
+    """Return the Lua text of a number.
+
+    Infinity and NaN are written like Fusion writes them, eg. `1.#INF` and
+    `-1.#IND`, which `loads()` reads back.
+
+    """
+    if math.isinf(value):
+        return "1.#INF" if value > 0 else "-1.#INF"
+    if math.isnan(value):
+        return "-1.#IND"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _quote(value):
+    """Return the Lua text of a string"""
+    value = (value.replace('\\', '\\\\').replace('"', '\\"')
+             .replace('\n', '\\n').replace('\r', '\\r')
+             .replace('\t', '\\t'))
+    return '"' + value + '"'
+
+
+def _key(key):
+    """Return the Lua text of a table key, including the equal sign"""
+    if isinstance(key, basestring):
+        if _IDENTIFIER.match(key) and key not in _KEYWORDS:
+            return key + " = "
+        return "[" + _quote(key) + "] = "
+    return "[" + _number(key) + "] = "
+
+
+def _items(table):
+    """Return the positional values and the keyed items of a table"""
+    if isinstance(table, (list, tuple)):
+        return list(table), []
+
+    positional = []
+    index = 1
+    while index in table:
+        positional.append(table[index])
+        index += 1
+
+    items = []
+    for key, value in table.items():
+        if key in ('__ctor', '__flags'):
+            continue
+        if (not isinstance(key, (basestring, bool)) and key == int(key) and
+                1 <= key < index):
+            continue
+        items.append((key, value))
+    return positional, items
+
+
+def _dumps(value, indent, level):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "nil"
+    if isinstance(value, basestring):
+        return _quote(value)
+    if not isinstance(value, (dict, list, tuple)):
+        return _number(value)
+
+    prefix = ""
+    if isinstance(value, dict):
+        if value.get('__flags') == ORDERED:
+            prefix = "ordered() "
+        elif '__ctor' in value:
+            prefix = value['__ctor'] + " "
+
+    positional, items = _items(value)
+    values = positional + [item for _, item in items]
+    if not values:
+        return prefix + "{ }"
+
+    lines = [_dumps(item, indent, level + 1) for item in positional]
+    lines.extend(_key(key) + _dumps(item, indent, level + 1)
+                 for key, item in items)
+
+    if not any(isinstance(item, (dict, list, tuple)) for item in values):
+        # Tables of plain values are written on a single line
+        return prefix + "{ " + ", ".join(lines) + " }"
+
+    inner = indent * (level + 1)
+    return (prefix + "{\n" +
+            "".join(inner + line + ",\n" for line in lines) +
+            indent * level + "}")
+
+
+def dumps(settings, indent="\t", level=0):
+    """Return the text of a settings table as stored in .setting files.
+
+    This is the inverse of `loads()`, eg. `loads(dumps(settings))` returns an
+    equal table. Lists and tuples are written as tables of positional values.
+
+    Args:
+        settings (dict): The settings table, eg. from `Tool.save_settings()`.
+        indent (str): The indentation of nested tables.
+        level (int): The indentation level of the table itself, to embed it
+            in other text. When not 0 no newline is added at the end.
+
+    Returns:
+        str: The Lua text of the settings table.
+
+    """
+    text = _dumps(settings, indent, level)
+    return text if level else text + "\n"
+
+
+def dump(settings, path, indent="\t"):
+    """Write a settings table to a .setting or .comp file, see `dumps()`.
+
+    Args:
+        settings (dict): The settings table.
+        path (str): The path of the file.
+        indent (str): The indentation of nested tables.
+
+    """
+    with open(path, "w") as f:
+        f.write(dumps(settings, indent=indent))
+
+
+class SettingsBuilder(object):
+    """Build the settings table of a network of tools in Python.
+
+    The resulting table can be applied to a comp with a single
+    `Comp.paste()` call or written to a .setting file, which is a lot faster
+    than creating and changing each tool through Fusion.
+
+    Example
+        >>> builder = SettingsBuilder()
+        >>> loader = builder.add_tool("Loader", pos=(0, 0))
+        >>> blur = builder.add_tool("Blur", inputs={"XBlurSize": 2.0},
+        >>>                         pos=(1, 0))
+        >>> builder.connect(loader, blur)
+        >>> builder.animate(blur, "BlurSize", [0, 10], [0.0, 5.0])
+        >>> comp.paste(builder.settings())
+        >>> builder.write("D:/blur.setting")
+
+    """
+
+    def __init__(self):
+        self.tools = dict()     # name -> tool settings
+        self._order = []
+
+    def _unique_name(self, reg_id):
+        index = 1
+        while "{0}{1}".format(reg_id, index) in self.tools:
+            index += 1
+        return "{0}{1}".format(reg_id, index)
+
+    def _inputs(self, tool):
+        return self.tools[tool].setdefault('Inputs', dict())
+
+    def add_tool(self, reg_id, name=None, inputs=None, pos=None):
+        """Add a tool.
+
+        Args:
+            reg_id (str): The registry ID of the tool's type, eg. "Blur".
+            name (str or None): The name of the tool. When None a name is
+                generated from the type, eg. "Blur1".
+            inputs (dict or None): The values of Inputs by ID.
+            pos (tuple or None): The (x, y) position in the Flow.
+
+        Returns:
+            str: The name of the tool.
+
+        """
+        if name is None:
+            name = self._unique_name(reg_id)
+        if name in self.tools:
+            raise ValueError("Tool already exists: {0}".format(name))
+
+        self.tools[name] = {'__ctor': reg_id}
+        self._order.append(name)
+        for id, value in (inputs or {}).items():
+            self.set_input(name, id, value)
+        if pos is not None:
+            self.set_pos(name, pos)
+        return name
+
+    def set_input(self, tool, input, value):
+        """Set the value of an Input.
+
+        Args:
+            tool (str): The name of the tool.
+            input (str): The ID of the Input.
+            value: The value, eg. a number, string or a settings table like
+                `{'__ctor': "FuID", 1: "Gaussian"}`.
+
+        """
+        if isinstance(value, (list, tuple)):
+            value = dict((float(index + 1), item)
+                         for index, item in enumerate(value))
+        self._inputs(tool)[input] = {'__ctor': "Input", 'Value': value}
+
+    def connect(self, source, target, input="Input", output="Output"):
+        """Connect the Output of one tool to the Input of another.
+
+        Args:
+            source (str): The name of the tool to connect from.
+            target (str): The name of the tool to connect to.
+            input (str): The ID of the Input of `target`.
+            output (str): The ID of the Output of `source`.
+
+        """
+        self._inputs(target)[input] = {'__ctor': "Input",
+                                       'SourceOp': source,
+                                       'Source': output}
+
+    def set_pos(self, tool, pos):
+        """Set the (x, y) position of a tool in the Flow."""
+        self.tools[tool]['ViewInfo'] = {
+            '__ctor': "OperatorInfo",
+            'Pos': {1.0: float(pos[0]) * FLOW_GRID[0],
+                    2.0: float(pos[1]) * FLOW_GRID[1]}
+        }
+
+    def animate(self, tool, input, times, values, interpolation="smooth"):
+        """Animate an Input with a BezierSpline.
+
+        Args:
+            tool (str): The name of the tool.
+            input (str): The ID of the Input.
+            times (list): The times to set a key at.
+            values (list): The value for each time.
+            interpolation (str): The interpolation between the keys, either
+                "smooth", "linear" or "step".
+
+        Returns:
+            str: The name of the BezierSpline.
+
+        """
+        points = sorted(zip([float(x) for x in times],
+                            [float(x) for x in values]))
+        name = tool + input
+        if name not in self.tools:
+            self._order.append(name)
+        self.tools[name] = {
+            '__ctor': "BezierSpline",
+            'SplineColor': {'Red': 1.0, 'Green': 1.0, 'Blue': 1.0},
+            'NameSet': True,
+            'KeyFrames': bezier_keyframes(points, interpolation=interpolation)
+        }
+        self.connect(name, tool, input=input, output="Value")
+        return name
+
+    def settings(self):
+        """Return the settings table of the tools.
+
+        Returns:
+            dict: The settings table, eg. for `Comp.paste()`.
+
+        """
+        tools = OrderedDict([('__flags', ORDERED)])
+        for name in self._order:
+            tools[name] = self.tools[name]
+        return {'Tools': tools}
+
+    def dumps(self):
+        """Return the text of the settings table, see `dumps()`."""
+        return dumps(self.settings())
+
+    def write(self, path):
+        """Write the settings table to a .setting file."""
+        dump(self.settings(), path)
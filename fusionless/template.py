@@ -0,0 +1,270 @@
+"""Generate comps from a template .comp file without Fusion.
+
+Shot comps are often the same template with only the loaded plates, the
+rendered outputs and the frame range changed. A `CompTemplate` applies those
+changes to the text of the template directly and writes the new .comp files,
+so no Fusion is needed and many shots can be generated in parallel.
+
+Only the tools that change are parsed and written again, the rest of the
+template is copied as is. Tools inside groups can be changed too, but not
+together with the group itself.
+
+    Example
+        >>> from fusionless.template import generate
+        >>> shots = [{"output": "/shots/sh0010/sh0010.comp",
+        >>>           "variables": {"SHOT": "sh0010"},
+        >>>           "loaders": {"Plate": "/plates/sh0010.1001.exr"},
+        >>>           "savers": {"Output": "/renders/sh0010.0000.exr"},
+        >>>           "frame_range": (1001, 1100)}]
+        >>> generate("/templates/comp.comp", shots, processes=8)
+
+"""
+
+import re
+import multiprocessing
+
+from . import settings as _settings
+
+_RANGES = ("RenderRange", "GlobalRange")
+_GROUPS = ("GroupOperator", "MacroOperator")
+_INDENT = re.compile(r"[ \t]*")
+
+
+class CompTemplate(object):
+    """A .comp file to generate comps for shots from.
+
+    Each shot is a dictionary with the changes for the shot:
+        output (str): The path to write the comp to, used by `write()`.
+        variables (dict, optional): Replaces "${KEY}" in all strings of the
+            template with the value by KEY.
+        loaders (dict, optional): The filename of the clip of Loaders by name.
+            Instead of a filename a dictionary of clip settings can be given,
+            eg. {"Filename": path, "StartFrame": 1001, "Length": 100}.
+            With a frame range the Length, TrimIn, TrimOut, GlobalStart and
+            GlobalEnd of these clips default to the frame range. The clips of
+            Loaders not in `loaders` aren't changed.
+        savers (dict, optional): The filename of Savers by name, or a
+            dictionary of clip settings.
+        frame_range (tuple, optional): The (start, end) of the render range
+            and global range of the comp.
+        inputs (dict, optional): The values of Inputs by ID, by tool name.
+
+    Args:
+        text (str): The contents of the template .comp file.
+
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    @classmethod
+    def load(cls, path):
+        """Load the template from a .comp file."""
+        with open(path, "r") as f:
+            return cls(f.read())
+
+    def render(self, shot):
+        """Return the text of the comp for a shot.
+
+        Args:
+            shot (dict): The changes for the shot.
+
+        Returns:
+            str: The contents of the .comp file.
+
+        Raises:
+            KeyError: When a tool to change isn't in the template.
+            ValueError: When both a group and a tool inside it are changed.
+
+        """
+        text = self.text
+        for key, value in (shot.get('variables') or {}).items():
+            # Escape the value like it would be in a string
+            value = _settings.dumps(str(value))[1:-2]
+            text = text.replace("${" + key + "}", value)
+
+        frame_range = shot.get('frame_range')
+        changes = dict()
+        for name, clip in (shot.get('loaders') or {}).items():
+            clip = _clip_settings(clip)
+            if frame_range is not None:
+                clip = dict(_clip_range(frame_range), **clip)
+            changes.setdefault(name, []).append((_set_loader_clip, clip))
+        for name, clip in (shot.get('savers') or {}).items():
+            changes.setdefault(name, []).append((_set_saver_clip, clip))
+        for name, values in (shot.get('inputs') or {}).items():
+            changes.setdefault(name, []).append((_set_inputs, values))
+
+        # Replace the changed tools from the end so the spans stay valid
+        spans = [span for span in _tool_spans(text) if span[0] in changes]
+        missing = set(changes) - set(span[0] for span in spans)
+        if missing:
+            raise KeyError("Tools not in template: "
+                           "{0}".format(", ".join(sorted(missing))))
+        spans.sort(key=lambda span: span[2])
+        for span, next_span in zip(spans, spans[1:]):
+            if next_span[2] < span[3]:
+                raise ValueError("Can't change {0} and {1} inside it".format(
+                    span[0], next_span[0]))
+
+        for name, reg_id, start, end in reversed(spans):
+            tool_settings = _settings.loads(text[start:end])
+            for change, value in changes[name]:
+                change(tool_settings, value)
+
+            indent, nested = _indentation(text, start, end)
+            tool_text = _settings.dumps(tool_settings, indent=nested)[:-1]
+            text = (text[:start] + tool_text.replace("\n", "\n" + indent) +
+                    text[end:])
+
+        if frame_range is not None:
+            text = _set_frame_range(text, frame_range)
+
+        return text
+
+    def write(self, shot, path=None):
+        """Write the comp for a shot.
+
+        Args:
+            shot (dict): The changes for the shot.
+            path (str or None): The path to write to. Defaults to the "output"
+                of the shot.
+
+        Returns:
+            str: The path written to.
+
+        """
+        if path is None:
+            path = shot['output']
+        text = self.render(shot)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+
+def _tool_spans(text, offset=0):
+    """Yield the spans of the tools in `text`, also of those inside groups.
+
+    See `settings.tool_spans()`, the spans of the tools inside a group are
+    yielded after the group itself.
+
+    """
+    for name, reg_id, start, end in _settings.tool_spans(text):
+        yield name, reg_id, start + offset, end + offset
+        if reg_id in _GROUPS:
+            for span in _tool_spans(text[start:end], offset + start):
+                yield span
+
+
+def _indentation(text, start, end):
+    """Return the indentation of the line of the table at `start` and the
+    indentation added per nested table, eg. tabs or spaces.
+
+    """
+    line = text.rfind("\n", 0, start) + 1
+    indent = _INDENT.match(text, line).group()
+    nested = "\t"
+    newline = text.find("\n", start, end)
+    if newline != -1:
+        inner = _INDENT.match(text, newline + 1).group()
+        if inner.startswith(indent) and len(inner) > len(indent):
+            nested = inner[len(indent):]
+    return indent, nested
+
+
+def _clip_settings(clip):
+    if isinstance(clip, dict):
+        return clip
+    return {'Filename': clip}
+
+
+def _clip_range(frame_range):
+    """Return the settings of a Loader clip spanning `frame_range`."""
+    start, end = [float(frame) for frame in frame_range]
+    length = end - start + 1.0
+    return {'Length': length, 'TrimIn': 0.0, 'TrimOut': length - 1.0,
+            'GlobalStart': start, 'GlobalEnd': end}
+
+
+def _set_loader_clip(tool_settings, clip):
+    clips = tool_settings.setdefault('Clips', dict())
+    settings = clips.setdefault(1.0, {'__ctor': "Clip"})
+    settings.update(_clip_settings(clip))
+
+
+def _set_saver_clip(tool_settings, clip):
+    inputs = tool_settings.setdefault('Inputs', dict())
+    input = inputs.setdefault('Clip', {'__ctor': "Input"})
+    value = input.get('Value')
+    if not isinstance(value, dict):
+        value = input['Value'] = {'__ctor': "Clip"}
+    value.update(_clip_settings(clip))
+
+
+def _set_inputs(tool_settings, values):
+    inputs = tool_settings.setdefault('Inputs', dict())
+    for id, value in values.items():
+        if isinstance(value, (list, tuple)):
+            value = dict((float(index + 1), item)
+                         for index, item in enumerate(value))
+        inputs[id] = {'__ctor': "Input", 'Value': value}
+
+
+def _set_frame_range(text, frame_range):
+    """Set the comp's frame ranges, which are outside of its `Tools` table."""
+    replacement = "{{ {0}, {1} }}".format(
+        *[_settings.dumps(float(frame))[:-1] for frame in frame_range])
+
+    for key in _RANGES:
+        pattern = re.compile(r"\b" + key + r"\s*=\s*\{[^{}]*\}")
+        span = _settings.tools_span(text) or (len(text), len(text))
+        match = (pattern.search(text, 0, span[0]) or
+                 pattern.search(text, span[1]))
+        if match is not None:
+            text = (text[:match.start()] + key + " = " + replacement +
+                    text[match.end():])
+    return text
+
+
+# The template of each worker process, see `generate()`
+_worker_template = None
+
+
+def _init_worker(text):
+    global _worker_template
+    _worker_template = CompTemplate(text)
+
+
+def _write_shot(shot):
+    return _worker_template.write(shot)
+
+
+def generate(template, shots, processes=None):
+    """Write the comps for many shots in parallel.
+
+    Args:
+        template (str or CompTemplate): The template or the path of the
+            template .comp file.
+        shots (list): The changes for each shot, see `CompTemplate`. The
+            "output" of each shot is the path its comp is written to.
+        processes (int or None): The amount of processes to use. Defaults to
+            the amount of CPUs.
+
+    Returns:
+        list: The paths of the written comps.
+
+    """
+    if not isinstance(template, CompTemplate):
+        template = CompTemplate.load(template)
+
+    if processes == 1:
+        return [template.write(shot) for shot in shots]
+
+    # The template is sent to each process once, not with each shot
+    pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                initargs=(template.text,))
+    try:
+        return pool.map(_write_shot, shots)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,143 @@
+import unittest
+
+from fusionless import core
+
+
+class Remote(object):
+    """Stand-in for a PyRemoteObject that counts its GetAttrs() calls"""
+
+    def __init__(self, type_name, attrs=None):
+        self.type_name = type_name
+        self.attrs = attrs or {}
+        self.calls = 0
+
+    def __str__(self):
+        return "{0} (0x{1:x}) [App: 'Fusion']".format(self.type_name,
+                                                     id(self))
+
+    def GetAttrs(self, key=None):
+        self.calls += 1
+        return dict(self.attrs) if key is None else self.attrs.get(key)
+
+    def SetAttrs(self, attrs):
+        self.calls += 1
+        self.attrs.update(attrs)
+
+
+class TestTypeCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = core.TypeCache(maxsize=2)
+        self.cache.register(core.Tool, type_name="Tool", attr_prefix="TOOL")
+        self.cache.register(core.Image, type_name="Image", transient=True)
+
+    def test_hits(self):
+        """ Test resolving a remote object once """
+        tool = Remote("Tool")
+        self.assertIs(self.cache.resolve(tool), core.Tool)
+        self.assertIs(self.cache.resolve(tool), core.Tool)
+        self.assertEqual(self.cache.stats(),
+                         {'hits': 1, 'misses': 1, 'size': 1})
+
+        # Unknown type names are resolved by the attribute prefix
+        other = Remote("Operator", {'TOOLS_Name': "Blur1"})
+        self.assertIs(self.cache.resolve(other), core.Tool)
+        self.assertEqual(other.calls, 1)
+
+    def test_eviction(self):
+        """ Test only the most recently used objects are kept """
+        first, second, third = Remote("Tool"), Remote("Tool"), Remote("Tool")
+        self.cache.resolve(first)
+        self.cache.resolve(second)
+        self.cache.resolve(first)
+        self.cache.resolve(third)
+        self.assertEqual(self.cache.stats()['size'], 2)
+
+        self.cache.resolve(first)
+        self.assertEqual(self.cache.hits, 2)
+        self.cache.resolve(second)
+        self.assertEqual(self.cache.misses, 4)
+
+    def test_invalidation(self):
+        """ Test discarded and transient objects aren't kept """
+        tool = Remote("Tool")
+        self.cache.resolve(tool)
+        self.cache.discard(tool)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+        self.assertIs(self.cache.resolve(Remote("Image")), core.Image)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+        self.cache.resolve(tool)
+        self.cache.clear()
+        self.assertEqual(self.cache.stats(),
+                         {'hits': 0, 'misses': 0, 'size': 0})
+
+
+class TestIdentityMap(unittest.TestCase):
+    def test_wrappers(self):
+        """ Test there's one wrapper per remote object """
+        reference = Remote("Tool")
+        tool = core.Tool(reference)
+        self.assertIs(core.PyObject(reference), tool)
+
+        core.identity_map.discard(reference)
+        self.assertIsNot(core.Tool(reference), tool)
+
+
+class TestAttrsCache(unittest.TestCase):
+    def tearDown(self):
+        core.attrs_cache.ttl = None
+
+    def test_scope(self):
+        """ Test attributes are fetched once within a scope """
+        reference = Remote("Tool", {'TOOLS_Name': "Blur1",
+                                    'TOOLS_RegID': "Blur"})
+        tool = core.Tool(reference)
+        with core.attrs_cache.scope():
+            tool.get_attr('TOOLS_Name')
+            tool.get_attrs()
+            self.assertEqual(reference.calls, 1)
+
+            # Setting attributes invalidates the snapshot
+            tool.set_attrs({'TOOLS_Name': "Blur2"})
+            self.assertEqual(tool.get_attr('TOOLS_Name'), "Blur2")
+            self.assertEqual(reference.calls, 3)
+
+        tool.get_attrs()
+        tool.get_attrs()
+        self.assertEqual(reference.calls, 5)
+
+    def test_keys(self):
+        """ Test only the requested attributes are fetched """
+        reference = Remote("Tool", {'TOOLS_Name': "Blur1",
+                                    'TOOLS_RegID': "Blur"})
+        attrs = core.Tool(reference).get_attrs(['TOOLS_Name', 'Missing'])
+        self.assertEqual(attrs, {'TOOLS_Name': "Blur1"})
+        self.assertEqual(reference.calls, 2)
+
+
+class TestInputSchemaCache(unittest.TestCase):
+    def test_schemas(self):
+        """ Test schemas are built once per tool type and Input ID """
+        cache = core.InputSchemaCache()
+        input = Remote("Input", {
+            'INPS_DataType': "FuID",
+            'INPIDT_ComboControl_ID': {1.0: "Box", 2.0: "Gaussian"}})
+        wrapper = core.Input(input)
+
+        schema = cache.get(("Blur", "Filter"), wrapper)
+        self.assertIs(cache.get(("Blur", "Filter"), wrapper), schema)
+        self.assertIs(cache.cached(("Blur", "Filter")), schema)
+        self.assertIsNone(cache.cached(("Blur", "XBlurSize")))
+        self.assertEqual(input.calls, 1)
+
+        self.assertEqual(schema.convert(1), "Gaussian")
+        self.assertEqual(schema.settings_value("Box"),
+                         {'__ctor': "FuID", 1.0: "Box"})
+
+        # The Inputs of groups differ per instance
+        cache.get(("GroupOperator", "Input1"), wrapper)
+        self.assertIsNone(cache.cached(("GroupOperator", "Input1")))
+
+        cache.clear()
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 0, 'size': 0})
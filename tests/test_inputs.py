@@ -0,0 +1,58 @@
+import unittest
+import fusionless as fu
+
+
+class TestInputs(unittest.TestCase):
+    def test_set_values(self):
+        """ Test setting keyframes in bulk and reading them back """
+        c = fu.Comp()
+
+        tool = c.create_tool("Blur")
+        input = tool.input("XBlurSize")
+
+        times = [0, 10, 20, 30]
+        values = [0.0, 5.0, 2.5, 1.0]
+        input.set_values(times, values, interpolation="linear")
+
+        self.assertEqual(sorted(input.get_keyframes()), times)
+        for time, value in zip(times, values):
+            self.assertAlmostEqual(input.get_value(time), value)
+
+        # Linear interpolation in between the keys
+        self.assertAlmostEqual(input.get_value(5), 2.5)
+
+        # Merge new keys with the existing ones
+        input.set_values([10, 40], [3.0, 4.0])
+        self.assertEqual(sorted(input.get_keyframes()), [0, 10, 20, 30, 40])
+        self.assertAlmostEqual(input.get_value(10), 3.0)
+
+        # The last key got a handle towards the new key after it
+        self.assertTrue(1.0 <= input.get_value(35) <= 4.0)
+
+        # Replace all existing keys
+        input.set_values([5, 15], [1.0, 2.0], replace=True)
+        self.assertEqual(sorted(input.get_keyframes()), [5, 15])
+
+        tool.delete()
+
+    def test_remove_keyframes(self):
+        """ Test removing keyframes by time range, index and all keys """
+        c = fu.Comp()
+
+        tool = c.create_tool("Blur")
+        input = tool.input("XBlurSize")
+        input.set_values(range(10), range(10))
+
+        self.assertEqual(input.remove_keyframes(time=(2, 4)), 3)
+        self.assertEqual(input.remove_keyframes(index=[0, -1]), 2)
+        self.assertEqual(sorted(input.get_keyframes()), [1, 5, 6, 7, 8])
+        self.assertEqual(input.remove_keyframes(time=range(7, 9)), 2)
+        self.assertEqual(sorted(input.get_keyframes()), [1, 5, 6])
+
+        value = input.get_value()
+        self.assertEqual(input.remove_keyframes(), 3)
+        self.assertFalse(input.get_keyframes())
+        self.assertFalse(input.is_connected())
+        self.assertEqual(input.get_value(), value)
+
+        tool.delete()
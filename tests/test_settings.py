@@ -0,0 +1,204 @@
+import unittest
+
+from fusionless import settings
+from fusionless.offline import OfflineComp
+
+
+COMP = """Composition {
+	CurrentTime = 1001,
+	RenderRange = { 1001, 1010 },
+	GlobalRange = { 1001, 1010 },
+	Tools = ordered() {
+		Loader1 = Loader {
+			Clips = {
+				Clip {
+					ID = "Clip1",
+					Filename = "/shots/sh0010/plate.1001.exr",
+					StartFrame = 1001,
+				},
+			},
+			ViewInfo = OperatorInfo { Pos = { 110, 33 } },
+		},
+		Blur1 = Blur {
+			Inputs = {
+				XBlurSize = Input {
+					SourceOp = "Blur1XBlurSize",
+					Source = "Value",
+				},
+				Filter = Input { Value = FuID { "Gaussian" }, },
+				Input = Input {
+					SourceOp = "Loader1",
+					Source = "Output",
+				},
+			},
+			ViewInfo = OperatorInfo { Pos = { 220, 82.5 } },
+		},
+		Blur1XBlurSize = BezierSpline {
+			SplineColor = { Red = 1, Green = 0, Blue = 0 },
+			NameSet = true,
+			KeyFrames = {
+				[1001] = { 0, RH = { 1004, 0 }, Flags = { Linear = true } },
+				[1010] = { 9, LH = { 1007, 9 } }
+			}
+		},
+		Saver1 = Saver {
+			Inputs = {
+				Clip = Input {
+					Value = Clip {
+						Filename = "/renders/sh0010/comp.\\"1001\\".exr",
+					},
+				},
+				Input = Input { SourceOp = "Blur1", },  -- default Source
+			},
+		}
+	},
+	ActiveTool = "Blur1"
+}
+"""
+
+
+class TestSettings(unittest.TestCase):
+    def test_loads(self):
+        """ Test parsing a comp to a settings table """
+        comp = settings.loads(COMP)
+
+        self.assertEqual(comp['__ctor'], "Composition")
+        self.assertEqual(comp['RenderRange'], {1.0: 1001.0, 2.0: 1010.0})
+        self.assertEqual(comp['Tools']['__flags'], settings.ORDERED)
+        self.assertEqual(sorted(comp['Tools']),
+                         ["Blur1", "Blur1XBlurSize", "Loader1", "Saver1",
+                          "__flags"])
+
+        blur = comp['Tools']['Blur1']
+        self.assertEqual(blur['__ctor'], "Blur")
+        self.assertEqual(blur['Inputs']['Filter']['Value'],
+                         {'__ctor': "FuID", 1.0: "Gaussian"})
+
+        spline = comp['Tools']['Blur1XBlurSize']
+        self.assertEqual(sorted(spline['KeyFrames']), [1001.0, 1010.0])
+        self.assertTrue(spline['KeyFrames'][1001]['Flags']['Linear'])
+
+        saver = comp['Tools']['Saver1']
+        self.assertEqual(saver['Inputs']['Clip']['Value']['Filename'],
+                         '/renders/sh0010/comp."1001".exr')
+
+        self.assertRaises(settings.SettingsParseError,
+                          settings.loads, "{ Tools = { }")
+
+    def test_loads_values(self):
+        """ Test parsing the numbers and names Fusion writes """
+        inf = float('inf')
+        table = settings.loads("{ 0x1F, -0X10, math.huge, -math.huge, "
+                               "-inf, 1.#INF, -1.#INF, 1e3, -.5 }")
+        self.assertEqual([table[float(i)] for i in range(1, 10)],
+                         [31.0, -16.0, inf, -inf, -inf, inf, -inf, 1000.0,
+                          -0.5])
+        nan = settings.loads("{ -1.#IND, 1.#QNAN, nan }")
+        self.assertTrue(all(value != value for value in nan.values()))
+
+        # Names that aren't a constructor or a constant aren't evaluated
+        self.assertRaises(settings.SettingsParseError,
+                          settings.loads, "{ Value = MyVariable }")
+        self.assertRaises(settings.SettingsParseError,
+                          settings.loads, "{ Value = math.pi }")
+
+        # `ordered()` tables keep their order
+        comp = settings.loads(COMP)
+        self.assertEqual(list(comp['Tools']),
+                         ["__flags", "Loader1", "Blur1", "Blur1XBlurSize",
+                          "Saver1"])
+
+    def test_iter_tools(self):
+        """ Test extracting tools of a type without parsing the others """
+        tools = list(settings.iter_tools(COMP, types=["Loader", "Saver"]))
+        self.assertEqual([name for name, _ in tools], ["Loader1", "Saver1"])
+        self.assertEqual(tools[0][1],
+                         settings.loads(COMP)['Tools']['Loader1'])
+
+        # Without newlines the braces are matched instead of the indentation
+        flat = " ".join(line.split("--")[0].strip()
+                        for line in COMP.splitlines())
+        self.assertEqual(dict(settings.iter_tools(flat)),
+                         dict(settings.iter_tools(COMP)))
+
+        # The tools of a .setting file aren't always an `ordered()` table
+        plain = COMP.replace("Tools = ordered() {", "Tools = {")
+        self.assertEqual([name for name, _ in settings.iter_tools(plain)],
+                         ["Loader1", "Blur1", "Blur1XBlurSize", "Saver1"])
+
+    def test_iter_connections(self):
+        """ Test reading connections from a settings table """
+        connections = list(settings.iter_connections(settings.loads(COMP)))
+        self.assertEqual(sorted(connections), [
+            (("Blur1", "Output"), ("Saver1", "Input")),
+            (("Blur1XBlurSize", "Value"), ("Blur1", "XBlurSize")),
+            (("Loader1", "Output"), ("Blur1", "Input"))
+        ])
+
+    def test_offline_comp(self):
+        """ Test querying a comp without Fusion """
+        comp = OfflineComp(COMP, filename="sh0010.comp")
+
+        attrs = comp.get_attrs()
+        self.assertEqual(attrs['COMPN_RenderStart'], 1001)
+        self.assertEqual(attrs['COMPN_RenderEnd'], 1010)
+        self.assertEqual(len(comp.get_tool_list()), 4)
+        self.assertEqual(comp.get_active_tool().name(), "Blur1")
+
+        loader = comp.get_tool_list(node_type="Loader")[0]
+        self.assertEqual(loader.get_attr('TOOLST_Clip_Name'),
+                         {1.0: "/shots/sh0010/plate.1001.exr"})
+        self.assertEqual(loader.get_pos(), [1.0, 1.0])
+
+        blur = comp.find_tool("Blur1")
+        input = blur.input("XBlurSize")
+        self.assertEqual(input.get_keyframes(), [1001.0, 1010.0])
+        self.assertEqual(input.get_value(), 0.0)
+        self.assertAlmostEqual(input.get_value(1004), 3.0)
+        self.assertEqual(blur.input("Input").get_connected_output().tool(),
+                         loader)
+
+        downstream = [input.tool().name() for output, input
+                      in blur.connections(inputs=False)]
+        self.assertEqual(downstream, ["Saver1"])
+
+    def test_dumps(self):
+        """ Test writing settings tables back to text """
+        comp = settings.loads(COMP)
+        self.assertEqual(settings.loads(settings.dumps(comp)), comp)
+
+        text = settings.dumps({'Pos': (1, 2.5), 'Name': 'a "b"\n',
+                               'Gamut.SLogVersion': True, 5: None})
+        self.assertEqual(settings.loads(text),
+                         {'Pos': {1.0: 1.0, 2.0: 2.5}, 'Name': 'a "b"\n',
+                          'Gamut.SLogVersion': True, 5.0: None})
+
+        # Infinity and NaN as written by Fusion
+        text = "{ Value = -1.#IND, Max = 1.#INF, Min = -1.#INF }\n"
+        self.assertEqual(settings.dumps(settings.loads(text)), text)
+        self.assertEqual(settings.dumps({1: float('nan')}), "{ -1.#IND }\n")
+
+    def test_builder(self):
+        """ Test building the settings of a network of tools """
+        builder = settings.SettingsBuilder()
+        loader = builder.add_tool("Loader", pos=(1, 1))
+        blur = builder.add_tool("Blur", inputs={"Filter": "Box"}, pos=(2, 1))
+        builder.connect(loader, blur)
+        builder.animate(blur, "XBlurSize", [0, 10], [0.0, 5.0],
+                        interpolation="linear")
+        self.assertEqual(blur, "Blur1")
+        self.assertEqual(list(builder.settings()['Tools']),
+                         ["__flags", "Loader1", "Blur1", "Blur1XBlurSize"])
+
+        comp = OfflineComp(builder.dumps())
+        self.assertEqual([tool.name() for tool in comp.get_tool_list()],
+                         ["Loader1", "Blur1", "Blur1XBlurSize"])
+        self.assertEqual(comp.find_tool("Blur1").get_pos(), [2.0, 1.0])
+
+        input = comp.find_tool("Blur1").input("XBlurSize")
+        self.assertAlmostEqual(input.get_value(5), 2.5)
+        self.assertEqual(comp.find_tool("Blur1").input("Filter").get_value(),
+                         "Box")
+        self.assertEqual(
+            comp.find_tool("Blur1").input("Input").get_connected_output()
+            .tool().name(), "Loader1")
@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fusionless import settings
+from fusionless.offline import OfflineComp
+from fusionless.template import CompTemplate, generate
+
+
+TEMPLATE = """Composition {
+	CurrentTime = 1,
+	RenderRange = { 1, 10 },
+	GlobalRange = { 1, 10 },
+	Tools = ordered() {
+		Plate = Loader {
+			Clips = {
+				Clip {
+					ID = "Clip1",
+					Filename = "/plates/template.0001.exr",
+				},
+			},
+			ViewInfo = OperatorInfo { Pos = { 110, 33 } },
+		},
+		Note = TextPlus {
+			Inputs = {
+				StyledText = Input { Value = "Shot ${SHOT}", },
+				Input = Input { SourceOp = "Plate", Source = "Output", },
+			},
+		},
+		Output = Saver {
+			Inputs = {
+				Input = Input { SourceOp = "Note", Source = "Output", },
+			},
+		},
+	},
+}
+"""
+
+
+GROUP = """Composition {
+    RenderRange = { 1, 10 },
+    Tools = ordered() {
+        Group1 = GroupOperator {
+            Inputs = ordered() { },
+            Tools = ordered() {
+                Inner = Loader {
+                    Clips = { Clip { Filename = "/plates/a.exr", }, },
+                },
+            },
+        },
+    },
+}
+"""
+
+
+class TestTemplate(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def shot(self, name):
+        return {"output": os.path.join(self.root, name + ".comp"),
+                "variables": {"SHOT": name},
+                "loaders": {"Plate": "/plates/{0}.1001.exr".format(name)},
+                "savers": {"Output": "/renders/{0}.exr".format(name)},
+                "frame_range": (1001, 1100),
+                "inputs": {"Note": {"Size": 0.1}}}
+
+    def test_render(self):
+        """ Test applying the changes for a shot to the template """
+        text = CompTemplate(TEMPLATE).render(self.shot("sh0010"))
+        comp = OfflineComp(text)
+
+        attrs = comp.get_attrs()
+        self.assertEqual(attrs['COMPN_RenderStart'], 1001)
+        self.assertEqual(attrs['COMPN_GlobalEnd'], 1100)
+
+        plate = comp.find_tool("Plate")
+        self.assertEqual(plate.get_attr('TOOLST_Clip_Name'),
+                         {1.0: "/plates/sh0010.1001.exr"})
+        self.assertEqual(plate.get_pos(), [1.0, 1.0])
+
+        output = comp.find_tool("Output")
+        self.assertEqual(output.get_attr('TOOLST_Clip_Name'),
+                         {1.0: "/renders/sh0010.exr"})
+        self.assertTrue(output.input("Input").is_connected())
+
+        note = comp.find_tool("Note")
+        self.assertEqual(note.input("StyledText").get_value(), "Shot sh0010")
+        self.assertEqual(note.input("Size").get_value(), 0.1)
+
+        self.assertRaises(KeyError, CompTemplate(TEMPLATE).render,
+                          {"loaders": {"Missing": "/plates/a.exr"}})
+
+    def test_render_loader_range(self):
+        """ Test the clip of changed Loaders spans the frame range """
+        text = CompTemplate(TEMPLATE).render(
+            {"loaders": {"Plate": {"Filename": "/plates/a.exr",
+                                   "TrimIn": 2}},
+             "frame_range": (1001, 1100)})
+        clip = settings.loads(text)['Tools']['Plate']['Clips'][1]
+        self.assertEqual(clip['Filename'], "/plates/a.exr")
+        self.assertEqual((clip['GlobalStart'], clip['GlobalEnd']),
+                         (1001, 1100))
+        self.assertEqual((clip['Length'], clip['TrimIn'], clip['TrimOut']),
+                         (100, 2, 99))
+
+    def test_render_group(self):
+        """ Test changing tools inside groups of a space indented comp """
+        template = CompTemplate(GROUP)
+        text = template.render({"loaders": {"Inner": "/plates/b.exr"}})
+        group = settings.loads(text)['Tools']['Group1']
+        self.assertEqual(group['Tools']['Inner']['Clips'][1]['Filename'],
+                         "/plates/b.exr")
+        self.assertIn("\n                Inner = Loader {\n"
+                      "                    Clips = {", text)
+        self.assertNotIn("\t", text)
+
+        self.assertRaises(ValueError, template.render,
+                          {"inputs": {"Group1": {"Blend": 0.5}},
+                           "loaders": {"Inner": "/plates/b.exr"}})
+
+    def test_generate(self):
+        """ Test writing the comps of many shots in parallel """
+        shots = [self.shot("sh{0:04d}".format(i)) for i in range(10, 60, 10)]
+        paths = generate(CompTemplate(TEMPLATE), shots, processes=2)
+
+        self.assertEqual(paths, [shot["output"] for shot in shots])
+        for shot in shots:
+            comp = OfflineComp.load(shot["output"])
+            saver = comp.find_tool("Output")
+            self.assertEqual(saver.get_attr('TOOLST_Clip_Name')[1],
+                             shot["savers"]["Output"])
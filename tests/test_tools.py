@@ -39,3 +39,96 @@ class TestTools(unittest.TestCase):
         self.assertEqual(pos, tmp_pos)
 
         tool.delete()
+
+    def test_traversal(self):
+        """ Test upstream, downstream and topological order of tools """
+        c = fu.Comp()
+
+        background = c.create_tool("Background")
+        blur = c.create_tool("Blur")
+        transform = c.create_tool("Transform")
+        merge = c.create_tool("Merge")
+        background.connect_main(blur)
+        background.connect_main(transform)
+        blur.connect_main(merge)
+        merge.input("Foreground").connect_to(transform.main_output(1))
+        tools = [merge, transform, blur, background]
+
+        upstream = merge.upstream()
+        self.assertEqual(len(upstream), 3)  # background is visited once
+        self.assertIs(upstream[-1], background)
+        self.assertEqual(len(merge.upstream(depth=1)), 2)
+        self.assertEqual(len(background.downstream()), 3)
+
+        order = c.topological_order(tools)
+        self.assertIs(order[0], background)
+        self.assertIs(order[-1], merge)
+
+        for tool in tools:
+            tool.delete()
+
+    def test_settings_round_trip(self):
+        """ Test writing and parsing the settings of a tool """
+        from fusionless import settings
+
+        c = fu.Comp()
+        tool = c.create_tool("Blur")
+        tool.input("XBlurSize").set_values([0, 10], [1.0, 5.0])
+
+        saved = tool.save_settings()
+        self.assertEqual(settings.loads(settings.dumps(saved)), saved)
+
+        tool.delete()
+
+    def test_batch(self):
+        """ Test writes are applied when leaving a batch """
+        c = fu.Comp()
+        tool = c.create_tool("Blur")
+
+        with c.batch() as batch:
+            for size in range(10):
+                tool.input("XBlurSize").set_value(size)
+                tool.input("YBlurSize").set_value(size)
+                tool.input("BlendClone").set_value(0.5)
+            tool.rename("batched_blur")
+            self.assertNotEqual(tool.name(), "batched_blur")
+
+        self.assertEqual(tool.name(), "batched_blur")
+        self.assertEqual(tool.input("XBlurSize").get_value(), 9.0)
+        self.assertEqual(tool.input("BlendClone").get_value(), 0.5)
+        self.assertEqual(batch.stats()['coalesced'], 4)
+        self.assertLess(batch.calls, batch.writes)
+
+        tool.delete()
+
+    def test_layout(self):
+        """ Test positions set within a layout are applied when leaving it """
+        c = fu.Comp()
+        tool = c.create_tool("Merge")
+
+        with c.layout():
+            tool.set_pos([10, 10])
+            tool.set_pos([20, 5])
+            self.assertEqual(tool.get_pos(), [20, 5])
+
+        self.assertEqual(tool.get_pos(), [20, 5])
+
+        tool.delete()
+
+    def test_get_positions(self):
+        """ Test reading the positions of many tools at once """
+        c = fu.Comp()
+        tools = [c.create_tool("Merge") for _ in range(3)]
+        for i, tool in enumerate(tools):
+            tool.set_pos([i, 10])
+
+        positions = c.flow().get_positions(tools)
+        for tool in tools:
+            self.assertEqual(positions[tool.name()], tool.get_pos())
+
+        names, array = c.flow().get_positions(tools, as_array=True)
+        self.assertEqual(len(names), 3)
+        self.assertEqual(len(array), 3)
+
+        for tool in tools:
+            tool.delete()